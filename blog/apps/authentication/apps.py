@@ -3,3 +3,6 @@ from django.apps import AppConfig
 
 class AuthenticationConfig(AppConfig):
     name = 'apps.authentication'
+
+    def ready(self):
+        import apps.authentication.signals
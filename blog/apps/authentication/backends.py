@@ -1,5 +1,7 @@
 import jwt
 
+from django.conf import settings
+from django.core.cache import cache
 from django.utils.translation import ugettext_lazy as _
 
 from rest_framework.authentication import (
@@ -8,6 +10,7 @@ from rest_framework.authentication import (
 
 from blog.settings import SECRET_KEY as secret
 from .models import User
+from .tokens import Token, VerifiedTokenCache
 
 
 class JWTAuthentication(BaseAuthentication):
@@ -23,35 +26,53 @@ class JWTAuthentication(BaseAuthentication):
     keyword = 'Bearer'
     exc_name = 'token_error'
     ALGORITHMS = ['HS256', ]
+    PRINCIPAL_CACHE_KEY = 'auth:principal:{}'
+    verified_tokens = VerifiedTokenCache(settings.AUTH_TOKEN_CACHE_SIZE)
+
+    @classmethod
+    def forget_principal(cls, pk):
+        cache.delete(cls.PRINCIPAL_CACHE_KEY.format(pk))
 
     def authenticate(self, request):
         """
-        Authenticate the request and return a two-tuple of (user, token).
+        Authenticate the request and return a two-tuple of (user, token),
+        where token is the verified incoming Token, not a new one.
         """
         auth_header = get_authorization_header(request).split()
         token = self._extract_token(auth_header)
         if not token:
             return None
-        try:
-            payload = jwt.decode(token, secret, algorithms=self.ALGORITHMS)
-        except jwt.exceptions.InvalidTokenError as e:
-            raise exceptions.AuthenticationFailed(e, self.exc_name)
-        return self.authenticate_credentials(payload['id'])
+        payload = self.verified_tokens.get(token)
+        if payload is None:
+            try:
+                payload = jwt.decode(token, secret, algorithms=self.ALGORITHMS)
+            except jwt.exceptions.InvalidTokenError as e:
+                raise exceptions.AuthenticationFailed(e, self.exc_name)
+            self.verified_tokens.set(token, payload)
+        user = self.authenticate_credentials(payload['id'])
+        return (user, Token(token.decode('utf-8'), payload))
 
     def authenticate_credentials(self, pk):
         """
-        Returns user and token if a user with such pk exists and active.
+        Returns user if a user with such pk exists and active.
+
+        Users are cached along with their profiles for a short time, the
+        entry is dropped whenever the user or the profile is saved or deleted.
         """
-        try:
-            user = User.objects.get(pk=pk)
-        except User.DoesNotExist:
-            msg = _('No user matching this token was found.')
-            raise exceptions.AuthenticationFailed(msg, self.exc_name)
+        key = self.PRINCIPAL_CACHE_KEY.format(pk)
+        user = cache.get(key)
+        if user is None:
+            try:
+                user = User.objects.select_related('profile').get(pk=pk)
+            except User.DoesNotExist:
+                msg = _('No user matching this token was found.')
+                raise exceptions.AuthenticationFailed(msg, self.exc_name)
+            cache.set(key, user, settings.AUTH_PRINCIPAL_CACHE_TIMEOUT)
 
         if not user.is_active:
             msg = _('This user has been deactivated.')
             raise exceptions.AuthenticationFailed(msg, self.exc_name)
-        return (user, user.token)
+        return user
 
     def _extract_token(self, auth_header):
         """
@@ -12,8 +12,11 @@ class User(AbstractUser):
     User with JWT.
     Token validity time is 24 hours by default. You can specify custom time in
     hours by adding parameter `token_valid_for` on initialization of class object.
+    A token can be exchanged for a new one without the password, during
+    `JWT_REFRESH_LIMIT_IN_HOURS` since the login, None means without a limit.
     """
     JWT_VALIDITY_IN_HOURS = 24
+    JWT_REFRESH_LIMIT_IN_HOURS = 7 * 24
 
     def __init__(self, *args, **kwargs):
         jwt_validity_period = kwargs.pop('token_valid_for', self.JWT_VALIDITY_IN_HOURS)
@@ -22,14 +25,39 @@ class User(AbstractUser):
 
     @property
     def token(self):
+        """
+        A newly signed token, every access signs another one. The token of
+        an authenticated request is `request.auth`.
+        """
         return self._generate_jwt()
 
-    def _generate_jwt(self):
+    def refresh_token(self, payload):
+        """
+        Returns a new token in place of the given claims of a verified one,
+        or None if the refresh limit since the login has passed. Tokens issued
+        before `orig_iat` claim was introduced are counted as issued at the
+        login, their refreshes keep that time and so are limited too.
+        """
+        orig_iat = payload.get('orig_iat', None)
+        if orig_iat is None:
+            orig_iat = payload['exp'] - timedelta(hours=self.JWT_VALIDITY_IN_HOURS).total_seconds()
+        if self.JWT_REFRESH_LIMIT_IN_HOURS is not None:
+            refresh_limit = timedelta(hours=self.JWT_REFRESH_LIMIT_IN_HOURS)
+            if datetime.fromtimestamp(orig_iat) + refresh_limit < datetime.now():
+                return None
+        return self._generate_jwt(orig_iat=orig_iat)
+
+    def _generate_jwt(self, orig_iat=None):
+        now = datetime.now()
         validity_period = timedelta(hours=self._token_valid_for)
         token = jwt.encode(
             {
                 'id': self.pk,
-                'exp': datetime.timestamp(datetime.now() + validity_period),
+                'profile_id': self.profile.pk,
+                'username': self.username,
+                'exp': datetime.timestamp(now + validity_period),
+                # time of the login, kept through refreshes
+                'orig_iat': orig_iat if orig_iat is not None else datetime.timestamp(now),
             },
             SECRET_KEY,
             algorithm='HS256',
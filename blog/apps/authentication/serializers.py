@@ -37,6 +37,32 @@ class LoginSerializer(serializers.Serializer):
         }
 
 
+class RefreshSerializer(serializers.Serializer):
+    """
+    Exchanges the verified token of the request, passed in context as `token`
+    along with its `user`, for a new one without checking the password.
+    """
+    username = serializers.CharField(read_only=True)
+    about = serializers.CharField(read_only=True)
+    pic = serializers.URLField(read_only=True)
+    email = serializers.EmailField(read_only=True)
+    token = serializers.CharField(read_only=True)
+
+    def validate(self, attrs):
+        user = self.context['user']
+        token = user.refresh_token(self.context['token'].payload)
+        if token is None:
+            msg = _('Token can not be refreshed anymore, log in again.')
+            raise exceptions.AuthenticationFailed(msg)
+        return {
+            'username': user.username,
+            'email': user.email,
+            'about': user.profile.about,
+            'pic': user.profile.pic,
+            'token': token,
+        }
+
+
 class RegistrationSerializer(serializers.ModelSerializer):
     """
     Handles user registration process. In addition creates a profile
@@ -91,13 +117,19 @@ class UserSerializer(serializers.ModelSerializer):
     def update(self, instance, validated_data):
         password = validated_data.pop('password', None)
         profile = validated_data.pop('profile', None)
+        # the user and the profile may come from the principal cache, so only
+        # the changed fields are written back, not their stale copies of the
+        # others, e.g. counters, password or active status
         for key, value in validated_data.items():
             setattr(instance, key, value)
+        update_fields = list(validated_data)
         if password:
             instance.set_password(password)
+            update_fields.append('password')
         if profile:
             for key, value in profile.items():
                 setattr(instance.profile, key, value)
-            instance.profile.save()
-        instance.save()
+            instance.profile.save(update_fields=list(profile) + ['modified_at'])
+        if update_fields:
+            instance.save(update_fields=update_fields)
         return instance
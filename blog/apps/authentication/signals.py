@@ -0,0 +1,19 @@
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from apps.profiles.models import Profile
+
+from .backends import JWTAuthentication
+from .models import User
+
+
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def forget_user_principal(sender, instance, **kwargs):
+    JWTAuthentication.forget_principal(instance.pk)
+
+
+@receiver(post_save, sender=Profile)
+@receiver(post_delete, sender=Profile)
+def forget_profile_principal(sender, instance, **kwargs):
+    JWTAuthentication.forget_principal(instance.user_id)
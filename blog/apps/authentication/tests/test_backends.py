@@ -1,5 +1,7 @@
-from time import sleep
+from time import sleep, time
+from unittest import mock
 
+from django.core.cache import cache
 from django.test import TestCase
 from django.http.request import HttpRequest
 
@@ -7,11 +9,14 @@ from rest_framework.authentication import exceptions
 
 from apps.authentication.models import User
 from apps.authentication.backends import JWTAuthentication
+from apps.authentication.tokens import Token, VerifiedTokenCache
 
 
 class AuthBackendTests(TestCase):
 
     def setUp(self):
+        cache.clear()
+        JWTAuthentication.verified_tokens.clear()
         self.user = User.objects.create_user(
             username='User1',
             password='qwerty123'
@@ -28,6 +33,46 @@ class AuthBackendTests(TestCase):
         auth_user, _auth_token = JWTAuthentication().authenticate(request)
         self.assertEqual(auth_user, self.user)
 
+    def test_incoming_token(self):
+        token = self.user.token
+        request = self._create_request_with_auth_header(token)
+        with mock.patch('apps.authentication.models.jwt.encode') as encode:
+            auth_user, auth_token = JWTAuthentication().authenticate(request)
+        encode.assert_not_called()
+        self.assertIsInstance(auth_token, Token)
+        self.assertEqual(auth_token.key, token)
+        self.assertEqual(auth_token.payload['id'], self.user.pk)
+
+    def test_token_verified_once(self):
+        request = self._create_request_with_auth_header(self.user.token)
+        JWTAuthentication().authenticate(request)
+        with mock.patch('apps.authentication.backends.jwt.decode') as decode:
+            auth_user, auth_token = JWTAuthentication().authenticate(request)
+        decode.assert_not_called()
+        self.assertEqual(auth_user, self.user)
+        self.assertEqual(auth_token.payload['id'], self.user.pk)
+        info = JWTAuthentication.verified_tokens.info()
+        self.assertEqual((info['hits'], info['misses'], info['size']), (1, 1, 1))
+
+    def test_principal_cached(self):
+        request = self._create_request_with_auth_header(self.user.token)
+        JWTAuthentication().authenticate(request)
+        with self.assertNumQueries(0):
+            auth_user, _auth_token = JWTAuthentication().authenticate(request)
+            self.assertEqual(auth_user.profile, self.user.profile)
+
+    def test_principal_forgotten_on_save(self):
+        request = self._create_request_with_auth_header(self.user.token)
+        JWTAuthentication().authenticate(request)
+        self.user.profile.about = 'changed'
+        self.user.profile.save()
+        auth_user, _auth_token = JWTAuthentication().authenticate(request)
+        self.assertEqual(auth_user.profile.about, 'changed')
+        self.user.is_active = False
+        self.user.save()
+        with self.assertRaises(exceptions.AuthenticationFailed):
+            JWTAuthentication().authenticate(request)
+
     def test_deleted_user(self):
         token = self.user.token
         self.user.delete()
@@ -79,3 +124,28 @@ class AuthBackendTests(TestCase):
         sleep(1)
         with self.assertRaises(exceptions.AuthenticationFailed):
             user, token = JWTAuthentication().authenticate(request)
+
+
+class VerifiedTokenCacheTests(TestCase):
+
+    def test_least_recently_used_evicted(self):
+        tokens = VerifiedTokenCache(max_size=2)
+        exp = time() + 60
+        tokens.set(b'a', {'id': 1, 'exp': exp})
+        tokens.set(b'b', {'id': 2, 'exp': exp})
+        self.assertEqual(tokens.get(b'a')['id'], 1)
+        tokens.set(b'c', {'id': 3, 'exp': exp})
+        self.assertIsNone(tokens.get(b'b'))
+        self.assertEqual(tokens.get(b'c')['id'], 3)
+        self.assertEqual(tokens.info(), {'hits': 2, 'misses': 1, 'size': 2, 'max_size': 2})
+
+    def test_expired_token(self):
+        tokens = VerifiedTokenCache(max_size=2)
+        tokens.set(b'a', {'id': 1, 'exp': time() - 1})
+        self.assertIsNone(tokens.get(b'a'))
+        self.assertEqual(tokens.info()['size'], 0)
+
+    def test_disabled(self):
+        tokens = VerifiedTokenCache(max_size=0)
+        tokens.set(b'a', {'id': 1, 'exp': time() + 60})
+        self.assertIsNone(tokens.get(b'a'))
@@ -56,3 +56,5 @@ class AuthModelTests(TestCase):
         expected_pk = user.pk
         data = jwt.decode(user.token, SECRET_KEY, algorithms=['HS256'])
         self.assertEqual(data['id'], expected_pk)
+        self.assertEqual(data['profile_id'], user.profile.pk)
+        self.assertEqual(data['username'], user.username)
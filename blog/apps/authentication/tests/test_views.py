@@ -1,8 +1,14 @@
 import json
+import jwt
 
+from datetime import datetime, timedelta
+
+from django.conf import settings
 from django.shortcuts import reverse
 from django.test import TestCase
 
+from rest_framework import status
+
 from apps.authentication.models import User
 
 
@@ -117,6 +123,61 @@ class LoginViewTests(TestCase):
         self.assertIsNone(user)
 
 
+class RefreshViewTests(TestCase):
+
+    fixtures = ['authentication.json']
+
+    def _refresh(self, token):
+        return self.client.post(
+            reverse('authentication:refresh_view'),
+            HTTP_AUTHORIZATION='Bearer ' + token
+        )
+
+    def _token(self, user, **claims):
+        payload = {
+            'id': user.pk,
+            'exp': datetime.timestamp(datetime.now() + timedelta(hours=1))
+        }
+        payload.update(claims)
+        return jwt.encode(payload, settings.SECRET_KEY, algorithm='HS256').decode('utf-8')
+
+    def test_refresh(self):
+        user = User.objects.first()
+        token = user.token
+        response = self._refresh(token)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        new_token = response.data['user']['token']
+        self.assertEqual(response.data['user']['username'], user.username)
+        payload = jwt.decode(new_token, settings.SECRET_KEY, algorithms=['HS256'])
+        self.assertEqual(
+            payload['orig_iat'],
+            jwt.decode(token, settings.SECRET_KEY, algorithms=['HS256'])['orig_iat']
+        )
+        self.assertEqual(self._refresh(new_token).status_code, status.HTTP_200_OK)
+
+    def test_refresh_token_without_orig_iat(self):
+        user = User.objects.first()
+        token = self._token(user)
+        exp = jwt.decode(token, settings.SECRET_KEY, algorithms=['HS256'])['exp']
+        login = exp - timedelta(hours=User.JWT_VALIDITY_IN_HOURS).total_seconds()
+        for i in range(2):
+            response = self._refresh(token)
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            payload = jwt.decode(response.data['user']['token'], settings.SECRET_KEY, algorithms=['HS256'])
+            self.assertEqual(payload['orig_iat'], login)
+
+    def test_refresh_limit(self):
+        user = User.objects.first()
+        login = datetime.now() - timedelta(hours=User.JWT_REFRESH_LIMIT_IN_HOURS + 1)
+        response = self._refresh(self._token(user, orig_iat=datetime.timestamp(login)))
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+        self.assertIsNone(response.data.get('user', None))
+
+    def test_refresh_unauthenticated(self):
+        response = self.client.post(reverse('authentication:refresh_view'))
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+
 class UserViewTests(TestCase):
 
     fixtures = ['authentication.json']
@@ -172,3 +233,23 @@ class UserViewTests(TestCase):
         user = User.objects.first()
         self.assertEqual(user.email, new_email)
         self.assertEqual(user.profile.about, new_about)
+
+    def test_update_keeps_fields_changed_elsewhere(self):
+        user = User.objects.first()
+        headers = {
+            'HTTP_AUTHORIZATION': 'Bearer ' + user.token,
+        }
+        # the user is cached along with the profile by the first request
+        self.client.get(reverse('authentication:retrieve_view'), **headers)
+        User.objects.filter(pk=user.pk).update(password='changed', first_name='Kenneth')
+        response = self.client.put(
+            reverse('authentication:retrieve_view'),
+            data=json.dumps({'user': {'email': 'kenneth@gmail.com'}}),
+            content_type='application/json',
+            **headers
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        user.refresh_from_db()
+        self.assertEqual(user.email, 'kenneth@gmail.com')
+        self.assertEqual(user.password, 'changed')
+        self.assertEqual(user.first_name, 'Kenneth')
@@ -0,0 +1,88 @@
+import hashlib
+import threading
+import time
+
+from collections import OrderedDict
+
+
+class Token(object):
+    """
+    Verified JWT of a request, available as `request.auth`. Carries the key,
+    as it was sent by the client, and its decoded claims.
+    """
+
+    def __init__(self, key, payload):
+        self.key = key
+        self.payload = payload
+
+    def __str__(self):
+        return self.key
+
+    @property
+    def profile_id(self):
+        """
+        Profile id of the user, None for tokens issued before the claim was
+        introduced.
+        """
+        return self.payload.get('profile_id', None)
+
+    @property
+    def username(self):
+        return self.payload.get('username', None)
+
+
+class VerifiedTokenCache(object):
+    """
+    Bounded LRU of claims of already verified tokens, keyed by the sha256 of a
+    token and kept until the token expires. It lives in the memory of a single
+    process, so `max_size` caps the memory used by every worker; 0 disables
+    the cache.
+    """
+
+    def __init__(self, max_size):
+        self.max_size = max_size
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        """
+        Returns claims of the token, if it was verified before and hasn't
+        expired yet, otherwise None.
+        """
+        digest = hashlib.sha256(key).digest()
+        with self._lock:
+            entry = self._entries.get(digest, None)
+            if entry is not None and entry[0] > time.time():
+                self._entries.move_to_end(digest)
+                self.hits += 1
+                return entry[1]
+            if entry is not None:
+                del self._entries[digest]
+            self.misses += 1
+            return None
+
+    def set(self, key, payload):
+        if self.max_size <= 0 or payload.get('exp', None) is None:
+            return
+        digest = hashlib.sha256(key).digest()
+        with self._lock:
+            self._entries[digest] = (float(payload['exp']), payload)
+            self._entries.move_to_end(digest)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.hits = 0
+            self.misses = 0
+
+    def info(self):
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'size': len(self._entries),
+            'max_size': self.max_size,
+        }
@@ -1,6 +1,6 @@
 from django.urls import re_path
 
-from .views import LoginAPIView, RegisterAPIView, UserAPIView
+from .views import LoginAPIView, RefreshAPIView, RegisterAPIView, UserAPIView
 
 app_name = 'authentication'
 
@@ -8,4 +8,5 @@ urlpatterns = [
     re_path(r'^user$', UserAPIView.as_view(), name='retrieve_view'),
     re_path(r'^users$', RegisterAPIView.as_view(), name='register_view'),
     re_path(r'^users/login$', LoginAPIView.as_view(), name='login_view'),
+    re_path(r'^users/refresh$', RefreshAPIView.as_view(), name='refresh_view'),
 ]
@@ -4,7 +4,7 @@ from rest_framework.permissions import AllowAny, IsAuthenticated
 from rest_framework.response import Response
 from rest_framework.views import APIView
 
-from .serializers import LoginSerializer, RegistrationSerializer, UserSerializer
+from .serializers import LoginSerializer, RefreshSerializer, RegistrationSerializer, UserSerializer
 
 
 class LoginAPIView(APIView):
@@ -18,6 +18,19 @@ class LoginAPIView(APIView):
         return Response({'user': serializer.data}, status=status.HTTP_200_OK)
 
 
+class RefreshAPIView(APIView):
+    serializer_class = RefreshSerializer
+    permission_classes = (IsAuthenticated,)
+
+    def post(self, request):
+        serializer = self.serializer_class(
+            data={},
+            context={'user': request.user, 'token': request.auth}
+        )
+        serializer.is_valid(raise_exception=True)
+        return Response({'user': serializer.data}, status=status.HTTP_200_OK)
+
+
 class RegisterAPIView(APIView):
     serializer_class = RegistrationSerializer
     permission_classes = (AllowAny,)
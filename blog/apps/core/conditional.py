@@ -0,0 +1,36 @@
+import hashlib
+
+from django.utils.cache import patch_vary_headers
+from django.utils.http import parse_etags, quote_etag
+
+from rest_framework import status
+from rest_framework.response import Response
+
+
+def make_etag(*validators):
+    """
+    Returns ETag built from the values, which change whenever the resource
+    representation changes, e.g. modification time, counters or max ids.
+    """
+    digest = hashlib.md5(repr(validators).encode('utf-8')).hexdigest()
+    return quote_etag(digest)
+
+
+def conditional_response(request, etag, get_response):
+    """
+    Returns empty 304 response if the client has a fresh copy of the resource
+    according to its If-None-Match header, otherwise calls get_response() to
+    build the response.
+
+    For example:
+
+    conditional_response(request, make_etag(post.modified_at), lambda: Response(...))
+    """
+    etags = parse_etags(request.META.get('HTTP_IF_NONE_MATCH', ''))
+    if etag in etags or '*' in etags:
+        response = Response(status=status.HTTP_304_NOT_MODIFIED)
+    else:
+        response = get_response()
+    response['ETag'] = etag
+    patch_vary_headers(response, ['Authorization'])
+    return response
@@ -0,0 +1,30 @@
+from django.db import connections, router
+
+
+def insert_or_ignore(model, **values):
+    """
+    Inserts a row with given field values into the table of <model>, unless it
+    violates a unique constraint, with a single statement and without reading
+    the table first. Returns the number of inserted rows, 1 or 0.
+
+    For example:
+
+    insert_or_ignore(Profile.favorites.through, profile_id=1, post_id=2)
+    """
+    connection = connections[router.db_for_write(model)]
+    ops = connection.ops
+    fields = [model._meta.get_field(name) for name in values]
+    sql = '{} {} ({}) VALUES ({}) {}'.format(
+        ops.insert_statement(ignore_conflicts=True),
+        ops.quote_name(model._meta.db_table),
+        ', '.join(ops.quote_name(field.column) for field in fields),
+        ', '.join(['%s'] * len(fields)),
+        ops.ignore_conflicts_suffix_sql(ignore_conflicts=True),
+    )
+    params = [
+        field.get_db_prep_save(value, connection)
+        for field, value in zip(fields, values.values())
+    ]
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+        return cursor.rowcount
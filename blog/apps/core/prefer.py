@@ -0,0 +1,26 @@
+from rest_framework import status
+from rest_framework.response import Response
+
+
+def prefers_minimal(request):
+    """
+    Returns True if client asked for a minimal response to a write, with
+    `Prefer: return=minimal` header or `?return=minimal` query parameter.
+    """
+    if request.query_params.get('return', None) == 'minimal':
+        return True
+    preferences = request.META.get('HTTP_PREFER', '').replace(';', ',').split(',')
+    return 'return=minimal' in (preference.strip().lower() for preference in preferences)
+
+
+def minimal_response(data=None):
+    """
+    Returns a response to a write in minimal mode: only given data, or empty
+    204 response if there's no data at all.
+    """
+    if data is None:
+        response = Response(status=status.HTTP_204_NO_CONTENT)
+    else:
+        response = Response(data, status=status.HTTP_200_OK)
+    response['Preference-Applied'] = 'return=minimal'
+    return response
@@ -1,4 +1,4 @@
-from django.db.models import Model
+from django.db.models import Model, QuerySet
 
 from rest_framework.exceptions import NotFound
 
@@ -6,6 +6,8 @@ from rest_framework.exceptions import NotFound
 def get_object_or_404(model, **kwargs):
     """
     Query db for a single object of <model> by one or more search criteria.
+    <model> can also be a QuerySet, which is useful when the object should be
+    fetched with annotations or related objects.
 
     For example:
 
@@ -13,10 +15,27 @@ def get_object_or_404(model, **kwargs):
 
     Will raise rest_framework.exceptions.NotFound if query fails.
     """
-    assert issubclass(model, Model)
+    if isinstance(model, QuerySet):
+        queryset = model
+        model = queryset.model
+    else:
+        assert issubclass(model, Model)
+        queryset = model._default_manager.all()
     try:
-        obj = model._default_manager.get(**kwargs)
+        obj = queryset.get(**kwargs)
         return obj
     except model.DoesNotExist:
         model_name = model._meta.verbose_name.capitalize()
         raise NotFound('{} not found.'.format(model_name))
+
+
+def get_profile_id(request):
+    """
+    Returns profile id of the authenticated request maker, taken from the
+    token claims, so that ownership checks don't need the profile. Tokens
+    without the claim fall back to the profile of request.user.
+    """
+    profile_id = getattr(request.auth, 'profile_id', None)
+    if profile_id is None:
+        profile_id = request.user.profile.pk
+    return profile_id
@@ -3,7 +3,7 @@ import factory
 from apps.posts.models import Comment, Post, Tag
 from apps.profiles.models import Profile
 from apps.authentication.models import User
-from apps.core.text import unique_slugify
+from apps.core.text import random_slugify
 
 
 class UserFactory(factory.Factory):
@@ -31,7 +31,7 @@ class PostFactory(factory.django.DjangoModelFactory):
     author = factory.SubFactory(ProfileFactory)
     body = factory.Faker('sentence', nb_words=4)
     title = factory.Sequence(lambda x: 'Post Title {}'.format(x))
-    slug = factory.LazyAttribute(lambda x: unique_slugify(model=Post, text=x.title))
+    slug = factory.LazyAttribute(lambda x: random_slugify(x.title))
 
 
 class CommentFactory(factory.django.DjangoModelFactory):
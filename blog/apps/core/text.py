@@ -1,7 +1,6 @@
 import string
 import random
 
-from django.db.models import Model
 from django.utils.text import slugify
 
 
@@ -9,16 +8,15 @@ def _generate_suffix(size=6, chars=string.ascii_lowercase + string.digits):
     return ''.join(random.choice(chars) for _ in range(size))
 
 
-def unique_slugify(*, model=None, text=''):
+def random_slugify(text, *, suffix_size=12, max_length=None):
     """
-    Returns unique slug for a given model, from given text by appending unique
-    prefix.
+    Returns slug from given text with a random suffix appended, cut to fit
+    into max_length. The suffix makes a collision unlikely but not
+    impossible, so callers rely on a unique index and retry on a collision.
     """
-    assert issubclass(model, Model)
     assert text != ''
     assert isinstance(text, str)
-    slug_exists = True
-    while slug_exists:
-        slug = '{}-{}'.format(slugify(text), _generate_suffix())
-        slug_exists = model._default_manager.filter(slug=slug).exists()
-    return slug
+    slug = slugify(text)
+    if max_length is not None:
+        slug = slug[:max_length - suffix_size - 1]
+    return '{}-{}'.format(slug, _generate_suffix(suffix_size))
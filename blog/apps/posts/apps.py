@@ -3,3 +3,6 @@ from django.apps import AppConfig
 
 class PostsConfig(AppConfig):
     name = 'apps.posts'
+
+    def ready(self):
+        import apps.posts.signals
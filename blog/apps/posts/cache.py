@@ -0,0 +1,71 @@
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Exists, OuterRef
+
+from rest_framework.exceptions import NotFound
+
+from apps.profiles.models import Profile
+
+from .models import Post
+from .serializers import PostSerializer
+
+# fields of serialized post, which change only along with its modified_at
+CACHED_FIELDS = ('slug', 'title', 'body', 'tagList', 'createdAt', 'updatedAt')
+
+
+def get_post_state(slug, user=None):
+    """
+    Returns a dict with modification time, counters, author and fields specific
+    for request maker of a post with given slug, read with one small query.
+    Together with cached fields it makes the post representation, see
+    render_post().
+
+    Will raise rest_framework.exceptions.NotFound if there is no such post.
+    """
+    fields = [
+        'pk', 'modified_at', 'likes_count', 'dislikes_count', 'favorites_count',
+        'comments_count', 'author__user__username', 'author__about', 'author__pic'
+    ]
+    qset = Post.objects.filter(slug=slug)
+    if user and user.is_authenticated:
+        profile = user.profile
+        favorites = Profile.favorites.through.objects.filter(profile=profile, post=OuterRef('pk'))
+        followees = Profile.followees.through.objects.filter(from_profile=profile, to_profile=OuterRef('author'))
+        qset = qset.annotate(favorited=Exists(favorites), following=Exists(followees))
+        fields += ['favorited', 'following']
+    state = qset.values(*fields).first()
+    if state is None:
+        raise NotFound('Post not found.')
+    state['slug'] = slug
+    return state
+
+
+def render_post(state):
+    """
+    Returns the same data as PostSerializer does for a post with given state.
+
+    Fields which change only when the post is saved are cached by slug and
+    modification time, everything else comes from the state.
+    """
+    key = 'post:{}:{}'.format(state['slug'], state['modified_at'].timestamp())
+    data = cache.get(key)
+    if data is None:
+        post = Post.objects.with_related().get(pk=state['pk'])
+        data = PostSerializer(post).data
+        data = {field: data[field] for field in CACHED_FIELDS}
+        cache.set(key, data, settings.POST_CACHE_TIMEOUT)
+
+    data.update({
+        'favorited': state.get('favorited', False),
+        'favoritesCount': state['favorites_count'],
+        'likes': state['likes_count'],
+        'dislikes': state['dislikes_count'],
+        'commentsCount': state['comments_count'],
+        'author': {
+            'username': state['author__user__username'],
+            'about': state['author__about'],
+            'pic': state['author__pic'],
+            'following': state.get('following', False),
+        },
+    })
+    return {field: data[field] for field in PostSerializer.Meta.fields}
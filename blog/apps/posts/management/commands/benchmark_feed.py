@@ -0,0 +1,122 @@
+import uuid
+
+from time import perf_counter
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Q
+
+from apps.posts.management.seed import create_profiles
+from apps.posts.models import FeedEntry, Post
+from apps.profiles.models import Profile
+
+
+class Command(BaseCommand):
+    help = (
+        'Measures latency of fan-out on write against pulling posts at read '
+        'time for authors with different number of followers, and reports '
+        'the follower count at which the fan-out gets slower than the write '
+        'latency budget. Works on the configured database inside a '
+        'transaction which is rolled back.'
+    )
+
+    page_size = 20
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--followers',
+            nargs='+',
+            type=int,
+            default=[10, 100, 1000, 10000, 50000],
+            help='Follower counts to measure.',
+        )
+        parser.add_argument(
+            '--feed-size',
+            type=int,
+            default=1000,
+            help='Number of posts already pushed into the reader\'s feed.',
+        )
+        parser.add_argument(
+            '--write-budget',
+            type=float,
+            default=100,
+            help='Acceptable latency of the fan-out of a single post, ms.',
+        )
+        parser.add_argument(
+            '--repeat',
+            type=int,
+            default=5,
+            help='Number of reads to average.',
+        )
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            reader = create_profiles(1)[0]
+            self._fill_feed(reader, options['feed_size'])
+            results = [
+                self._measure(reader, followers, options['repeat'])
+                for followers in sorted(options['followers'])
+            ]
+            transaction.set_rollback(True)
+        self.stdout.write('{:>10} {:>14} {:>14} {:>14}'.format(
+            'followers', 'fan-out, ms', 'push read, ms', 'pull read, ms'
+        ))
+        crossover = None
+        for followers, write, push_read, pull_read in results:
+            self.stdout.write('{:>10} {:>14.2f} {:>14.2f} {:>14.2f}'.format(
+                followers, write, push_read, pull_read
+            ))
+            if crossover is None and write > options['write_budget']:
+                # fan-out cost is linear in the number of followers
+                crossover = int(followers * options['write_budget'] / write)
+        if crossover is None:
+            self.stdout.write('Fan-out fits the write budget for all measured follower counts.')
+        else:
+            self.stdout.write(
+                'Fan-out exceeds the write budget at about {} followers, '
+                'consider it for FEED_FANOUT_FOLLOWERS_LIMIT.'.format(crossover)
+            )
+
+    def _follow(self, followers, author):
+        Follow = Profile.followees.through
+        Follow.objects.bulk_create(
+            Follow(from_profile_id=follower.pk, to_profile_id=author.pk) for follower in followers
+        )
+        Profile.objects.filter(pk=author.pk).update(followers_count=len(followers))
+        author.refresh_from_db()
+
+    def _fill_feed(self, reader, size):
+        author = create_profiles(1)[0]
+        self._follow([reader], author)
+        for i in range(size):
+            Post.objects.create(author=author, slug=uuid.uuid4().hex, title='filler', body='filler')
+
+    def _measure(self, reader, followers, repeat):
+        author = create_profiles(1)[0]
+        self._follow([reader] + create_profiles(followers - 1), author)
+
+        start = perf_counter()
+        post = Post.objects.create(author=author, slug=uuid.uuid4().hex, title='pushed', body='pushed')
+        write = (perf_counter() - start) * 1000
+
+        push_read = self._time(repeat, lambda: [
+            entry.post for entry in FeedEntry.objects.filter(owner=reader).select_related('post').order_by(
+                '-created_at', '-id'
+            )[:self.page_size]
+        ])
+
+        FeedEntry.objects.filter(post=post).delete()
+        Profile.objects.filter(pk=author.pk).update(is_popular=True)
+        pushed = FeedEntry.objects.filter(owner=reader).values('post_id')
+        pull_read = self._time(repeat, lambda: list(
+            Post.objects.filter(Q(pk__in=pushed) | Q(author__in=[author.pk])).order_by(
+                '-created_at', '-id'
+            )[:self.page_size]
+        ))
+        return followers, write, push_read, pull_read
+
+    def _time(self, repeat, query):
+        start = perf_counter()
+        for i in range(repeat):
+            query()
+        return (perf_counter() - start) * 1000 / repeat
@@ -0,0 +1,144 @@
+import uuid
+
+from time import perf_counter
+
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+
+from apps.posts.management.seed import create_profiles
+from apps.posts.models import Comment, Post
+from apps.profiles.models import Profile
+
+
+class Command(BaseCommand):
+    help = (
+        'Seeds posts, comments, favorites and follows, then measures the '
+        'list, cursor, author, comments and reverse many-to-many queries '
+        'with the composite indexes and with the indexes dropped, printing '
+        'the query plans of both runs. Reverse many-to-many lookups use the '
+        'foreign key indexes in both runs. Works on the configured database '
+        'inside a transaction which is rolled back.'
+    )
+
+    page_size = 20
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--posts',
+            type=int,
+            default=1000000,
+            help='Number of posts to seed.',
+        )
+        parser.add_argument(
+            '--authors',
+            type=int,
+            default=1000,
+            help='Number of profiles the posts are spread over.',
+        )
+        parser.add_argument(
+            '--comments',
+            type=int,
+            default=100,
+            help='Number of comments, favorites and follows of the measured post and author.',
+        )
+        parser.add_argument(
+            '--repeat',
+            type=int,
+            default=5,
+            help='Number of runs of each query to average.',
+        )
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            authors = create_profiles(options['authors'])
+            self._create_posts(authors, options['posts'])
+            author = authors[len(authors) // 2]
+            post = author.posts.order_by('-created_at', '-id').first()
+            self._react(post, author, authors, options['comments'])
+
+            queries = self._queries(post, author)
+            indexed = self._measure(queries, options['repeat'], 'indexed')
+            self._drop_indexes()
+            plain = self._measure(queries, options['repeat'], 'dropped')
+            transaction.set_rollback(True)
+
+        self.stdout.write('{:>12} {:>14} {:>14}'.format('query', 'indexed, ms', 'dropped, ms'))
+        for name in queries:
+            self.stdout.write('{:>12} {:>14.2f} {:>14.2f}'.format(
+                name, indexed[name][0], plain[name][0]
+            ))
+        for name in queries:
+            self.stdout.write('\n{}\n  indexed: {}\n  dropped: {}'.format(
+                name,
+                indexed[name][1].replace('\n', '\n           '),
+                plain[name][1].replace('\n', '\n           '),
+            ))
+
+    def _create_posts(self, authors, number, chunk=10000):
+        # chunked to keep the memory flat, bulk_create splits each chunk
+        # further by the backend limit on query parameters
+        for start in range(0, number, chunk):
+            Post.objects.bulk_create(
+                Post(
+                    author_id=authors[i % len(authors)].pk,
+                    slug=uuid.uuid4().hex,
+                    title='seeded',
+                    body='seeded',
+                )
+                for i in range(start, min(start + chunk, number))
+            )
+
+    def _react(self, post, author, profiles, number):
+        profiles = profiles[:number]
+        Comment.objects.bulk_create(
+            Comment(post=post, author_id=profile.pk, title='seeded', body='seeded') for profile in profiles
+        )
+        Favorite = Profile.favorites.through
+        Favorite.objects.bulk_create(
+            Favorite(profile_id=profile.pk, post_id=post.pk) for profile in profiles
+        )
+        Follow = Profile.followees.through
+        Follow.objects.bulk_create(
+            Follow(from_profile_id=profile.pk, to_profile_id=author.pk)
+            for profile in profiles if profile.pk != author.pk
+        )
+
+    def _queries(self, post, author):
+        return {
+            'list': Post.objects.order_by('-created_at', '-modified_at')[:self.page_size],
+            'cursor': Post.objects.filter(
+                created_at__lt=post.created_at
+            ).order_by('-created_at', '-id')[:self.page_size],
+            'author': Post.objects.filter(author=author).order_by('-created_at', '-id')[:self.page_size],
+            'comments': Comment.objects.filter(post=post).order_by('created_at', 'id')[:self.page_size],
+            'favoriters': Profile.favorites.through.objects.filter(post=post).values('profile_id'),
+            'followers': Profile.followees.through.objects.filter(
+                to_profile=author
+            ).values('from_profile_id'),
+        }
+
+    def _measure(self, queries, repeat, phase):
+        results = {}
+        for name, queryset in queries.items():
+            start = perf_counter()
+            for i in range(repeat):
+                list(queryset.all())
+            results[name] = ((perf_counter() - start) * 1000 / repeat, self._explain(queryset, phase))
+        return results
+
+    def _explain(self, queryset, phase):
+        # the phase comment keeps the sqlite3 statement cache from returning
+        # the plan prepared before the indexes were dropped
+        sql, params = queryset.query.sql_with_params()
+        with connection.cursor() as cursor:
+            cursor.execute('{} {} /* {} */'.format(connection.ops.explain_query_prefix(), sql, phase), params)
+            return '\n'.join(' '.join(str(column) for column in row) for row in cursor.fetchall())
+
+    def _drop_indexes(self):
+        # the schema editor isn't entered, on SQLite that refuses to run
+        # inside a transaction, only its SQL is used
+        schema_editor = connection.schema_editor()
+        with connection.cursor() as cursor:
+            for model in (Post, Comment):
+                for index in model._meta.indexes:
+                    cursor.execute(str(index.remove_sql(model, schema_editor)))
@@ -0,0 +1,47 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db.models import F, Q
+
+from apps.posts.models import Post, Tag
+from apps.profiles.models import Profile
+
+
+class Command(BaseCommand):
+    help = (
+        'Recalculates likes, dislikes, favorites and comments counters of posts, '
+        'posts counters of tags, and followers counters and popularity flags of '
+        'profiles, which have drifted.'
+    )
+
+    batch_size = 1000
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Only report number of posts, tags and profiles with wrong counters.',
+        )
+
+    def handle(self, *args, **options):
+        drifted = Post.objects.with_actual_counters().exclude(
+            **{counter: F('actual_' + counter) for counter in Post.COUNTERS}
+        )
+        self.reconcile(drifted, 'post(s)', options['dry_run'])
+        drifted = Tag.objects.with_actual_counters().exclude(posts_count=F('actual_posts_count'))
+        self.reconcile(drifted, 'tag(s)', options['dry_run'])
+        # follows are removed by cascade along with deleted profiles, which
+        # doesn't update the counter
+        drifted = Profile.objects.with_actual_counters().filter(
+            ~Q(followers_count=F('actual_followers_count')) |
+            Q(is_popular=False, actual_followers_count__gt=settings.FEED_FANOUT_FOLLOWERS_LIMIT)
+        )
+        self.reconcile(drifted, 'profile(s)', options['dry_run'])
+
+    def reconcile(self, drifted, name, dry_run):
+        pks = list(drifted.values_list('pk', flat=True))
+        if not dry_run:
+            for start in range(0, len(pks), self.batch_size):
+                drifted.model.objects.filter(pk__in=pks[start:start + self.batch_size]).reconcile_counters()
+        self.stdout.write('{} {} with drifted counters{}.'.format(
+            len(pks), name, '' if dry_run else ' reconciled'
+        ))
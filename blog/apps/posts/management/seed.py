@@ -0,0 +1,18 @@
+import uuid
+
+from apps.authentication.models import User
+from apps.profiles.models import Profile
+
+
+def create_profiles(number):
+    """
+    Creates `number` users with profiles for the benchmarks, returned in the
+    order of creation.
+    """
+    # bulk_create doesn't send signals creating profiles, and doesn't set
+    # pks on every backend, so both are queried back
+    prefix = 'bench{}'.format(uuid.uuid4().hex[:8])
+    User.objects.bulk_create(User(username='{}{}'.format(prefix, i)) for i in range(number))
+    users = User.objects.filter(username__startswith=prefix)
+    Profile.objects.bulk_create(Profile(user=user) for user in users)
+    return list(Profile.objects.filter(user__username__startswith=prefix).order_by('pk'))
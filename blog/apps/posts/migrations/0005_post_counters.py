@@ -0,0 +1,54 @@
+# Generated by Django 2.2.28 on 2026-10-18 17:11
+
+from django.db import migrations, models
+from django.db.models.functions import Coalesce
+
+
+def count_related(apps, schema_editor):
+    Post = apps.get_model('posts', 'Post')
+    Comment = apps.get_model('posts', 'Comment')
+    Profile = apps.get_model('profiles', 'Profile')
+    related = {
+        'likes_count': Profile.liked_posts.through,
+        'dislikes_count': Profile.disliked_posts.through,
+        'favorites_count': Profile.favorites.through,
+        'comments_count': Comment,
+    }
+    counters = {}
+    for counter, model in related.items():
+        count = model.objects.filter(post=models.OuterRef('pk')).order_by()
+        count = count.values('post').annotate(count=models.Count('*')).values('count')
+        counters[counter] = Coalesce(models.Subquery(count), 0)
+    Post.objects.update(**counters)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0004_auto_20180428_2204'),
+        ('profiles', '0004_auto_20180330_1704'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='post',
+            name='comments_count',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='post',
+            name='dislikes_count',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='post',
+            name='favorites_count',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='post',
+            name='likes_count',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.RunPython(count_related, migrations.RunPython.noop),
+    ]
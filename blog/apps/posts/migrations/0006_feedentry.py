@@ -0,0 +1,51 @@
+# Generated by Django 2.2.28 on 2026-10-18 17:14
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+FEED_BACKFILL_LIMIT = 1000
+
+
+def fill_feeds(apps, schema_editor):
+    Post = apps.get_model('posts', 'Post')
+    FeedEntry = apps.get_model('posts', 'FeedEntry')
+    Profile = apps.get_model('profiles', 'Profile')
+    follows = Profile.followees.through.objects.values_list('from_profile_id', 'to_profile_id')
+    for owner, author in follows.iterator():
+        posts = Post.objects.filter(author=author).order_by('-created_at')[:FEED_BACKFILL_LIMIT]
+        FeedEntry.objects.bulk_create(
+            [
+                FeedEntry(owner_id=owner, post_id=pk, created_at=created_at)
+                for pk, created_at in posts.values_list('pk', 'created_at')
+            ],
+            batch_size=1000,
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('profiles', '0004_auto_20180330_1704'),
+        ('posts', '0005_post_counters'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='FeedEntry',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created_at', models.DateTimeField()),
+                ('owner', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='feed_entries', to='profiles.Profile')),
+                ('post', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='feed_entries', to='posts.Post')),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='feedentry',
+            index=models.Index(fields=['owner', '-created_at', '-id'], name='posts_feede_owner_i_1043d9_idx'),
+        ),
+        migrations.AlterUniqueTogether(
+            name='feedentry',
+            unique_together={('owner', 'post')},
+        ),
+        migrations.RunPython(fill_feeds, migrations.RunPython.noop),
+    ]
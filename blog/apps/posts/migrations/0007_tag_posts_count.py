@@ -0,0 +1,32 @@
+# Generated by Django 2.2.28 on 2026-10-18 19:02
+
+from django.db import migrations, models
+from django.db.models.functions import Coalesce
+
+
+def count_posts(apps, schema_editor):
+    Tag = apps.get_model('posts', 'Tag')
+    Post = apps.get_model('posts', 'Post')
+    count = Post.tags.through.objects.filter(tag=models.OuterRef('pk')).order_by()
+    count = count.values('tag').annotate(count=models.Count('*')).values('count')
+    Tag.objects.update(posts_count=Coalesce(models.Subquery(count), 0))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0006_feedentry'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='tag',
+            name='posts_count',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddIndex(
+            model_name='tag',
+            index=models.Index(fields=['-posts_count', 'id'], name='posts_tag_posts_c_d23e54_idx'),
+        ),
+        migrations.RunPython(count_posts, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,47 @@
+# Generated by Django 2.2.28 on 2026-10-18 21:37
+
+from django.db import migrations
+
+
+POSTGRES_VECTOR = (
+    "setweight(to_tsvector('english', title), 'A') || "
+    "setweight(to_tsvector('english', body), 'B')"
+)
+
+
+def create_search_index(apps, schema_editor):
+    """
+    The index is database specific and unknown to the ORM, see
+    apps.posts.search.
+    """
+    vendor = schema_editor.connection.vendor
+    if vendor == 'postgresql':
+        schema_editor.execute('ALTER TABLE posts_post ADD COLUMN search_vector tsvector')
+        schema_editor.execute('UPDATE posts_post SET search_vector = {}'.format(POSTGRES_VECTOR))
+        schema_editor.execute(
+            'CREATE INDEX posts_post_search_vector_idx ON posts_post USING GIN (search_vector)'
+        )
+    elif vendor == 'sqlite':
+        schema_editor.execute('CREATE VIRTUAL TABLE posts_post_fts USING fts5(title, body)')
+        schema_editor.execute(
+            'INSERT INTO posts_post_fts (rowid, title, body) SELECT id, title, body FROM posts_post'
+        )
+
+
+def drop_search_index(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == 'postgresql':
+        schema_editor.execute('ALTER TABLE posts_post DROP COLUMN search_vector')
+    elif vendor == 'sqlite':
+        schema_editor.execute('DROP TABLE posts_post_fts')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0007_tag_posts_count'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
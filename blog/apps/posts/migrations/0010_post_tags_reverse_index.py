@@ -0,0 +1,27 @@
+from django.db import migrations, models
+
+# Covering index for filtering posts by tags, which goes from the tag side.
+# Removed by 0012: Django already indexes the tag column of the table, which
+# serves the same lookups.
+REVERSE_INDEX = models.Index(fields=['tag', 'post'], name='posts_post_tags_tag_post_idx')
+
+
+def add_index(apps, schema_editor):
+    Post = apps.get_model('posts', 'Post')
+    schema_editor.add_index(Post.tags.through, REVERSE_INDEX)
+
+
+def remove_index(apps, schema_editor):
+    Post = apps.get_model('posts', 'Post')
+    schema_editor.remove_index(Post.tags.through, REVERSE_INDEX)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0009_post_comment_indexes'),
+    ]
+
+    operations = [
+        migrations.RunPython(add_index, remove_index),
+    ]
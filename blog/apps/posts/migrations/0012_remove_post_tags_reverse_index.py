@@ -0,0 +1,27 @@
+from django.db import migrations, models
+
+# The index of 0010 starts with the column Django already indexes for the
+# foreign key to Tag, so it only added covering and cost every tag link an
+# extra index write.
+REVERSE_INDEX = models.Index(fields=['tag', 'post'], name='posts_post_tags_tag_post_idx')
+
+
+def remove_index(apps, schema_editor):
+    Post = apps.get_model('posts', 'Post')
+    schema_editor.remove_index(Post.tags.through, REVERSE_INDEX)
+
+
+def add_index(apps, schema_editor):
+    Post = apps.get_model('posts', 'Post')
+    schema_editor.add_index(Post.tags.through, REVERSE_INDEX)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0011_drop_fk_indexes_covered_by_composites'),
+    ]
+
+    operations = [
+        migrations.RunPython(remove_index, add_index),
+    ]
@@ -1,25 +1,205 @@
-from django.db import models
+from django.conf import settings
+from django.db import IntegrityError, connections, models, transaction
+from django.db.models.functions import Coalesce
 
 from apps.core.models import TimeStampedModel
+from apps.core.text import random_slugify
+
+
+class TagQuerySet(models.QuerySet):
+
+    def get_or_create_all(self, bodies):
+        """
+        Set-based get_or_create: returns tags with the given bodies, creating
+        the missing ones with a single INSERT. Tags created concurrently by
+        someone else are skipped on insert and picked up by the second fetch.
+        """
+        bodies = set(bodies)
+        tags = list(self.filter(body__in=bodies))
+        missing = bodies.difference(tag.body for tag in tags)
+        if missing:
+            self.bulk_create([Tag(body=body) for body in missing], ignore_conflicts=True)
+            tags.extend(self.filter(body__in=missing))
+        return tags
+
+    def popular(self):
+        return self.order_by('-posts_count', 'id')
+
+    def with_actual_counters(self):
+        """
+        Annotate every tag with `actual_posts_count`, calculated from the
+        posts-tags table. Meant for reconciliation of the counter.
+        """
+        return self.annotate(actual_posts_count=self._actual_posts_count())
+
+    def reconcile_counters(self):
+        return self.update(posts_count=self._actual_posts_count())
+
+    def _actual_posts_count(self):
+        count = Post.tags.through.objects.filter(tag=models.OuterRef('pk')).order_by()
+        count = count.values('tag').annotate(count=models.Count('*')).values('count')
+        return Coalesce(models.Subquery(count), 0)
 
 
 class Tag(models.Model):
     body = models.TextField(db_index=True, max_length=50, unique=True, blank=False)
+    # denormalized number of posts with the tag, kept in sync by the
+    # signals on Post.tags
+    posts_count = models.IntegerField(default=0)
+
+    objects = TagQuerySet.as_manager()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['-posts_count', 'id']),
+        ]
 
     def __str__(self):
         return self.body
 
 
+class PostQuerySet(models.QuerySet):
+
+    def with_related(self):
+        """
+        Eager-load everything PostSerializer touches: author with user in the
+        same query, and tags with one extra query for the whole queryset.
+        """
+        return self.select_related('author__user').prefetch_related('tags')
+
+    def merged_feed(self, owner, authors, size, position=None, reverse=False):
+        """
+        Posts pushed into owner's feed merged with the posts of `authors`,
+        which aren't pushed. Only the `size` newest posts of every source
+        older than the (created_at, id) position are merged, the oldest newer
+        ones if `reverse`. Each source is a range of an index, of the feed by
+        owner or of the posts by author, so the cost doesn't depend on the
+        length of the feed.
+        """
+        order = ('created_at', 'id') if reverse else ('-created_at', '-id')
+        bound = 'created_at__gte' if reverse else 'created_at__lte'
+        sources = [FeedEntry.objects.filter(owner=owner).values_list('post_id', flat=True)]
+        sources += [Post.objects.filter(author=author).values_list('pk', flat=True) for author in authors]
+        if position is not None:
+            sources = [source.filter(**{bound: position[0]}) for source in sources]
+        sources = [source.order_by(*order)[:size] for source in sources]
+        # a single query where the backend allows limits in parts of a UNION
+        if connections[self.db].features.supports_slicing_ordering_in_compound:
+            sources = [sources[0].union(*sources[1:], all=True)]
+        return self.filter(pk__in={pk for source in sources for pk in source})
+
+    def tagged(self, bodies, match_all=False):
+        """
+        Posts with any of the tags, or with all of them if `match_all`. Filters
+        by a subquery on the posts-tags table instead of joining it, so rows
+        aren't duplicated and no DISTINCT is needed. All tags are matched by
+        counting the links of every post, not by a join per tag.
+        """
+        bodies = set(bodies)
+        tag_ids = Tag.objects.filter(body__in=bodies).values('pk')
+        links = Post.tags.through.objects.filter(tag_id__in=tag_ids).order_by()
+        if match_all:
+            links = links.values('post_id').annotate(
+                tags_count=models.Count('tag_id')
+            ).filter(tags_count=len(bodies))
+        return self.filter(pk__in=links.values('post_id'))
+
+    def with_actual_counters(self):
+        """
+        Annotate every post with `actual_<counter>` fields, calculated from
+        the related tables. Too expensive for request time, meant for
+        reconciliation of the counters.
+        """
+        return self.annotate(**{
+            'actual_' + counter: count for counter, count in self._actual_counters().items()
+        })
+
+    def reconcile_counters(self):
+        """
+        Overwrites counters with the values calculated from the related tables,
+        one UPDATE statement for the whole queryset.
+        """
+        return self.update(**self._actual_counters())
+
+    def _actual_counters(self):
+        related = {
+            'likes_count': Post.liked_by.through,
+            'dislikes_count': Post.disliked_by.through,
+            'favorites_count': Post.favorited_by.through,
+            'comments_count': Comment,
+        }
+        counters = {}
+        for counter, model in related.items():
+            count = model.objects.filter(post=models.OuterRef('pk')).order_by()
+            count = count.values('post').annotate(count=models.Count('*')).values('count')
+            counters[counter] = Coalesce(models.Subquery(count), 0)
+        return counters
+
+
 class Post(TimeStampedModel):
+    COUNTERS = ('likes_count', 'dislikes_count', 'favorites_count', 'comments_count')
+    SLUG_ATTEMPTS = 3
+
     slug = models.SlugField(db_index=True, max_length=128, unique=True, blank=False)
     title = models.CharField(max_length=128, blank=False)
     body = models.TextField(max_length=1000, blank=False)
-    author = models.ForeignKey('profiles.Profile', related_name='posts', on_delete=models.CASCADE)
+    # indexed as the prefix of the (author, created_at, id) index
+    author = models.ForeignKey(
+        'profiles.Profile', related_name='posts', on_delete=models.CASCADE, db_index=False
+    )
     tags = models.ManyToManyField('posts.Tag', related_name='posts')
+    # denormalized counters, kept in sync by Profile reactions, the comment
+    # signal and Comment.delete, see `reconcile_post_counters` command for
+    # fixing the drift
+    likes_count = models.IntegerField(default=0)
+    dislikes_count = models.IntegerField(default=0)
+    favorites_count = models.IntegerField(default=0)
+    comments_count = models.IntegerField(default=0)
+
+    objects = PostQuerySet.as_manager()
+
+    class Meta:
+        indexes = [
+            # list ordering, cursor pagination and posts of an author
+            models.Index(fields=['-created_at', '-modified_at']),
+            models.Index(fields=['-created_at', '-id']),
+            models.Index(fields=['author', '-created_at', '-id']),
+        ]
 
     def __str__(self):
         return self.title
 
+    def save_with_new_slug(self):
+        """
+        Saves the post with a new slug made from its title. The unique index
+        on slug decides if the slug is free, a collision is retried with
+        another suffix.
+        """
+        max_length = self._meta.get_field('slug').max_length
+        for attempt in range(self.SLUG_ATTEMPTS):
+            self.slug = random_slugify(self.title, max_length=max_length)
+            try:
+                with transaction.atomic():
+                    self.save()
+                return
+            except IntegrityError:
+                if attempt == self.SLUG_ATTEMPTS - 1:
+                    raise
+
+    def change_counters(self, **deltas):
+        """
+        Atomically adds deltas to the counters in db, and mirrors the change
+        on this instance, e.g. post.change_counters(likes_count=1).
+        """
+        deltas = {field: delta for field, delta in deltas.items() if delta}
+        if not deltas:
+            return
+        Post.objects.filter(pk=self.pk).update(
+            **{field: models.F(field) + delta for field, delta in deltas.items()}
+        )
+        for field, delta in deltas.items():
+            setattr(self, field, getattr(self, field) + delta)
+
     def get_likes(self):
         return self.liked_by.count()
 
@@ -30,8 +210,81 @@ class Post(TimeStampedModel):
 class Comment(TimeStampedModel):
     title = models.CharField(max_length=100, blank=False)
     body = models.TextField(max_length=500, blank=False)
-    post = models.ForeignKey('posts.Post', related_name='comments', on_delete=models.CASCADE)
+    # indexed as the prefix of the (post, created_at, id) index
+    post = models.ForeignKey('posts.Post', related_name='comments', on_delete=models.CASCADE, db_index=False)
     author = models.ForeignKey('profiles.Profile', related_name='comments', on_delete=models.CASCADE)
 
+    class Meta:
+        indexes = [
+            # cursor pagination of a thread
+            models.Index(fields=['post', 'created_at', 'id']),
+        ]
+
     def __str__(self):
         return self.title
+
+    def delete(self, *args, **kwargs):
+        """
+        Deletes the comment and decrements the counter of its post. Not a
+        post_delete receiver, which would disable the fast delete of comments
+        cascading from a post or a profile. Comments of a deleted profile are
+        left to `reconcile_post_counters`.
+        """
+        deleted = super().delete(*args, **kwargs)
+        Post.objects.filter(pk=self.post_id).update(comments_count=models.F('comments_count') - 1)
+        return deleted
+
+
+class FeedEntryQuerySet(models.QuerySet):
+
+    def fan_out(self, post):
+        """
+        Puts a new post into the feeds of all followers of its author, unless
+        the author is popular, then followers pull it at read time.
+        """
+        if post.author.is_popular:
+            return
+        Profile = self.model._meta.get_field('owner').related_model
+        followers = Profile.followees.through.objects.filter(to_profile=post.author_id)
+        self.bulk_create(
+            FeedEntry(owner_id=follower, post=post, created_at=post.created_at)
+            for follower in followers.values_list('from_profile_id', flat=True).iterator()
+        )
+
+    def backfill(self, owner, author):
+        """
+        Puts the most recent posts of a newly followed author into owner's feed.
+        """
+        posts = author.posts.order_by('-created_at')[:settings.FEED_BACKFILL_LIMIT]
+        self.bulk_create(
+            (
+                FeedEntry(owner=owner, post_id=pk, created_at=created_at)
+                for pk, created_at in posts.values_list('pk', 'created_at')
+            ),
+            ignore_conflicts=True,
+        )
+
+    def prune(self, owner, author):
+        """
+        Removes posts of an unfollowed author from owner's feed.
+        """
+        return self.filter(owner=owner, post__author=author).delete()
+
+
+class FeedEntry(models.Model):
+    """
+    Materialized home feed, filled on write: a row for every post in the feed
+    of every follower of its author. Creation time of the post is copied, so
+    the feed of a profile is a range scan over a single index.
+    """
+    owner = models.ForeignKey('profiles.Profile', related_name='feed_entries', on_delete=models.CASCADE)
+    post = models.ForeignKey('posts.Post', related_name='feed_entries', on_delete=models.CASCADE)
+    created_at = models.DateTimeField()
+
+    objects = FeedEntryQuerySet.as_manager()
+
+    class Meta:
+        unique_together = ('owner', 'post')
+        indexes = [
+            models.Index(fields=['owner', '-created_at', '-id']),
+        ]
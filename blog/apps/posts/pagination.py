@@ -1,19 +1,316 @@
+import hashlib
+import json
+
+from base64 import urlsafe_b64decode, urlsafe_b64encode
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.exceptions import EmptyResultSet, ValidationError
+from django.db import connection
+from django.db.models import Q
+
 from rest_framework import status
-from rest_framework.pagination import LimitOffsetPagination
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination, LimitOffsetPagination
 from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
+
+
+class CursorPaginationMixin(object):
+    """
+    Makes a generic view use `cursor_pagination_class` instead of its
+    `pagination_class` when client asks for it with `?pagination=cursor`.
+    """
+
+    cursor_pagination_class = None
+
+    @property
+    def paginator(self):
+        if not hasattr(self, '_paginator'):
+            if self.request.query_params.get('pagination', None) == 'cursor':
+                self._paginator = self.cursor_pagination_class()
+            else:
+                self._paginator = self.pagination_class()
+        return self._paginator
 
 
 class PostsPaginaton(LimitOffsetPagination):
+    """
+    Limit/offset pagination which reports total number of posts.
+
+    Clients that don't need `postsCount` can skip it with `?count=false`.
+    Otherwise the count is cached for a short time for every distinct filtered
+    queryset, and big unfiltered tables on PostgreSQL are estimated from the
+    planner statistics instead of being counted.
+
+    Views which paginate a window of a bigger queryset set `count_queryset`
+    to the whole one.
+    """
 
     default_limit = 5
+    count_query_param = 'count'
+    count_cache_timeout = settings.POSTS_COUNT_CACHE_TIMEOUT
+    count_estimate_threshold = settings.POSTS_COUNT_ESTIMATE_THRESHOLD
+    count_queryset = None
+
+    def paginate_queryset(self, queryset, request, view=None):
+        if self._count_requested(request):
+            return super(PostsPaginaton, self).paginate_queryset(queryset, request, view)
+        self.count = None
+        self.limit = self.get_limit(request)
+        if self.limit is None:
+            return None
+        self.offset = self.get_offset(request)
+        self.request = request
+        # fetch one extra row to find out if there is a next page
+        page = list(queryset[self.offset:self.offset + self.limit + 1])
+        self.has_next = len(page) > self.limit
+        return page[:self.limit]
+
+    def get_count(self, queryset):
+        if self.count_queryset is not None:
+            queryset = self.count_queryset
+        try:
+            key = 'posts_count:{}'.format(
+                hashlib.md5(str(queryset.query).encode()).hexdigest()
+            )
+        except EmptyResultSet:
+            return 0
+        count = cache.get(key)
+        if count is None:
+            count = self._estimate_count(queryset)
+            if count is None:
+                count = queryset.count()
+            cache.set(key, count, self.count_cache_timeout)
+        return count
+
+    def get_next_link(self):
+        if self.count is not None:
+            return super(PostsPaginaton, self).get_next_link()
+        if not self.has_next:
+            return None
+        url = self.request.build_absolute_uri()
+        url = replace_query_param(url, self.limit_query_param, self.limit)
+        return replace_query_param(url, self.offset_query_param, self.offset + self.limit)
+
+    def get_paginated_response(self, data):
+        response_data = {
+            'next': self.get_next_link(),
+            'previous': self.get_previous_link(),
+            'posts': data
+        }
+        if self.count is not None:
+            response_data['postsCount'] = self.count
+        return Response(response_data, status=status.HTTP_200_OK)
+
+    def _count_requested(self, request):
+        value = request.query_params.get(self.count_query_param, 'true')
+        return value.lower() not in ('false', '0', 'no')
+
+    def _estimate_count(self, queryset):
+        """
+        Returns planner's estimate of the number of rows for unfiltered posts
+        table on PostgreSQL, if it is big enough for an exact count to be slow.
+        """
+        if connection.vendor != 'postgresql' or queryset.query.where:
+            return None
+        with connection.cursor() as cursor:
+            cursor.execute(
+                'SELECT reltuples FROM pg_class WHERE relname = %s',
+                [queryset.model._meta.db_table]
+            )
+            row = cursor.fetchone()
+        if row is None or row[0] < self.count_estimate_threshold:
+            return None
+        return int(row[0])
+
+
+class KeysetPagination(BasePagination):
+    """
+    Cursor pagination which seeks to the position by all fields of `ordering`,
+    the last of which has to be unique. Unlike DRF's CursorPagination, which
+    positions by the first field only and skips rows sharing its value by
+    offset, it works for orderings by columns with many equal values.
+
+    The cursor holds the values of the ordering fields of the last row of a
+    page (the first one for previous pages). The condition on them is led by
+    a bound on the first field, so an index matching the ordering is entered
+    at the position instead of being scanned from the start.
+    """
+
+    cursor_query_param = 'cursor'
+    invalid_cursor_message = 'Invalid cursor'
+    page_size = None
+    page_size_query_param = 'limit'
+    max_page_size = None
+    ordering = None
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.page_size = self.get_page_size(request)
+        if not self.page_size:
+            return None
+        self.request = request
+        self.model = queryset.model
+        position, reverse = self.decode_cursor(request, self.model)
+        ordering = self.ordering
+        if reverse:
+            ordering = tuple(field[1:] if field.startswith('-') else '-' + field for field in ordering)
+        if position is not None:
+            queryset = queryset.filter(self.get_seek_condition(ordering, position))
+        # fetch one extra row to find out if there is a page past this one
+        rows = list(queryset.order_by(*ordering)[:self.page_size + 1])
+        self.page = rows[:self.page_size]
+        if reverse:
+            self.page.reverse()
+            self.has_next, self.has_previous = position is not None, len(rows) > self.page_size
+        else:
+            self.has_next, self.has_previous = len(rows) > self.page_size, position is not None
+        return self.page
+
+    def get_page_size(self, request):
+        try:
+            page_size = int(request.query_params[self.page_size_query_param])
+        except (KeyError, ValueError):
+            return self.page_size
+        if page_size <= 0:
+            return self.page_size
+        if self.max_page_size:
+            return min(page_size, self.max_page_size)
+        return page_size
+
+    def get_seek_condition(self, ordering, position):
+        """
+        Rows past the position in the given ordering: the first field is past
+        its value, or equal to it and the second one is past its value, etc.
+        """
+        condition = Q()
+        equal = Q()
+        for field, value in zip(ordering, position):
+            name = field.lstrip('-')
+            condition |= equal & Q(**{name + ('__lt' if field.startswith('-') else '__gt'): value})
+            equal &= Q(**{name: value})
+        first = ordering[0]
+        bound = Q(**{first.lstrip('-') + ('__lte' if first.startswith('-') else '__gte'): position[0]})
+        return bound & condition
+
+    def get_next_link(self):
+        if not self.has_next or not self.page:
+            return None
+        return self.encode_cursor(self.page[-1], reverse=False)
+
+    def get_previous_link(self):
+        if not self.has_previous or not self.page:
+            return None
+        return self.encode_cursor(self.page[0], reverse=True)
+
+    def decode_cursor(self, request, model):
+        encoded = request.query_params.get(self.cursor_query_param, None)
+        if encoded is None:
+            return None, False
+        try:
+            cursor = json.loads(urlsafe_b64decode(encoded.encode('ascii')).decode('ascii'))
+            if len(cursor['p']) != len(self.ordering):
+                raise ValueError
+            position = [
+                self._get_field(model, field).to_python(value) for field, value in zip(self.ordering, cursor['p'])
+            ]
+            if None in position:
+                raise ValueError
+            return position, bool(cursor.get('r', False))
+        except (TypeError, ValueError, KeyError, ValidationError):
+            raise NotFound(self.invalid_cursor_message)
+
+    def encode_cursor(self, row, reverse):
+        cursor = {'p': [self._get_field(self.model, field).value_to_string(row) for field in self.ordering]}
+        if reverse:
+            cursor['r'] = True
+        encoded = urlsafe_b64encode(json.dumps(cursor).encode('ascii')).decode('ascii')
+        return replace_query_param(self.request.build_absolute_uri(), self.cursor_query_param, encoded)
+
+    def _get_field(self, model, field):
+        return model._meta.get_field(field.lstrip('-'))
+
+
+class PostsCursorPagination(KeysetPagination):
+    """
+    Keyset pagination over (created_at, id), newest first. Unlike
+    PostsPaginaton it doesn't count rows and doesn't scan skipped ones, so the
+    deep pages cost the same as the first one.
+
+    Next and previous links carry an opaque `cursor` query parameter.
+    """
+
+    page_size = PostsPaginaton.default_limit
+    page_size_query_param = 'limit'
+    ordering = ('-created_at', '-id')
 
     def get_paginated_response(self, data):
         return Response(
             {
-                'postsCount': self.count,
                 'next': self.get_next_link(),
                 'previous': self.get_previous_link(),
                 'posts': data
             },
             status=status.HTTP_200_OK
         )
+
+
+class CommentsCursorPagination(KeysetPagination):
+    """
+    Keyset pagination of a comment thread over (created_at, id), oldest
+    first, so every page costs the same however long the thread is.
+    """
+
+    page_size = 20
+    page_size_query_param = 'limit'
+    max_page_size = 100
+    ordering = ('created_at', 'id')
+
+    def get_paginated_response(self, data):
+        return Response(
+            {
+                'next': self.get_next_link(),
+                'previous': self.get_previous_link(),
+                'comments': data
+            },
+            status=status.HTTP_200_OK
+        )
+
+
+class TagsPagination(LimitOffsetPagination):
+    """
+    Limit/offset pagination of tags, with the total number of them.
+    """
+
+    default_limit = 20
+
+    def get_paginated_response(self, data):
+        return Response(
+            {
+                'next': self.get_next_link(),
+                'previous': self.get_previous_link(),
+                'tagsCount': self.count,
+                'tagList': data
+            },
+            status=status.HTTP_200_OK
+        )
+
+
+class TagsCursorPagination(KeysetPagination):
+    """
+    Keyset pagination of tags over (posts_count, id), most popular first.
+    """
+
+    page_size = TagsPagination.default_limit
+    page_size_query_param = 'limit'
+    ordering = ('-posts_count', 'id')
+
+    def get_paginated_response(self, data):
+        return Response(
+            {
+                'next': self.get_next_link(),
+                'previous': self.get_previous_link(),
+                'tagList': data
+            },
+            status=status.HTTP_200_OK
+        )
@@ -0,0 +1,90 @@
+"""
+Full-text search over titles and bodies of posts.
+
+The index lives outside of the ORM, it is created by the `0008_post_search`
+migration and updated on every save of a post by the signals:
+
+ - PostgreSQL: `search_vector` tsvector column of the posts table, with the
+   title weighted above the body, and a GIN index on it;
+ - SQLite: `posts_post_fts` FTS5 table, with post ids as rowids.
+
+Other databases fall back to a plain case-insensitive substring filter.
+"""
+import re
+
+from django.db import connection
+from django.db.models import BooleanField, FloatField, Q, Value
+from django.db.models.expressions import RawSQL
+
+SEARCH_CONFIG = 'english'
+FTS_TABLE = 'posts_post_fts'
+
+# the expression is repeated in the migration
+POSTGRES_VECTOR = (
+    "setweight(to_tsvector('english', title), 'A') || "
+    "setweight(to_tsvector('english', body), 'B')"
+)
+
+
+def search(queryset, text):
+    """
+    Filters posts queryset down to the posts with all the words of the text,
+    best matches first. Every post gets `search_rank` annotation.
+    """
+    words = re.findall(r'\w+', text)
+    if not words:
+        return queryset.none()
+    table = connection.ops.quote_name(queryset.model._meta.db_table)
+    if connection.vendor == 'postgresql':
+        tsquery = 'plainto_tsquery(%s, %s)'
+        params = [SEARCH_CONFIG, ' '.join(words)]
+        queryset = queryset.annotate(
+            search_match=RawSQL(
+                '{}.search_vector @@ {}'.format(table, tsquery), params, output_field=BooleanField()
+            ),
+            search_rank=RawSQL(
+                'ts_rank({}.search_vector, {})'.format(table, tsquery), params, output_field=FloatField()
+            ),
+        ).filter(search_match=True)
+    elif connection.vendor == 'sqlite':
+        # every word is quoted, so that FTS5 query syntax can't get in
+        match = ' '.join('"{}"'.format(word) for word in words)
+        queryset = queryset.annotate(
+            search_match=RawSQL(
+                '{1}.id IN (SELECT rowid FROM {0} WHERE {0} MATCH %s)'.format(FTS_TABLE, table),
+                [match],
+                output_field=BooleanField()
+            ),
+            # bm25 is lower for better matches, title weighs twice the body
+            search_rank=RawSQL(
+                'SELECT -bm25({0}, 2.0, 1.0) FROM {0} WHERE {0} MATCH %s AND rowid = {1}.id'.format(FTS_TABLE, table),
+                [match],
+                output_field=FloatField()
+            ),
+        ).filter(search_match=True)
+    else:
+        for word in words:
+            queryset = queryset.filter(Q(title__icontains=word) | Q(body__icontains=word))
+        queryset = queryset.annotate(search_rank=Value(0.0, output_field=FloatField()))
+    return queryset.order_by('-search_rank', '-created_at', '-id')
+
+
+def index_post(post):
+    with connection.cursor() as cursor:
+        if connection.vendor == 'postgresql':
+            cursor.execute(
+                'UPDATE posts_post SET search_vector = {} WHERE id = %s'.format(POSTGRES_VECTOR),
+                [post.pk]
+            )
+        elif connection.vendor == 'sqlite':
+            cursor.execute(
+                'INSERT OR REPLACE INTO {} (rowid, title, body) VALUES (%s, %s, %s)'.format(FTS_TABLE),
+                [post.pk, post.title, post.body]
+            )
+
+
+def unindex_post(pk):
+    # the column goes away along with the row on PostgreSQL
+    if connection.vendor == 'sqlite':
+        with connection.cursor() as cursor:
+            cursor.execute('DELETE FROM {} WHERE rowid = %s'.format(FTS_TABLE), [pk])
@@ -1,16 +1,30 @@
+from django.db import models
 from django.utils.text import slugify
 from django.utils.translation import ugettext_lazy as _
 
 from rest_framework import serializers
 from rest_framework.exceptions import ValidationError
 
-from apps.core.text import unique_slugify
-
 from apps.posts.models import Comment, Post, Tag
 
 from apps.profiles.serializers import ProfileSerializer
 
 
+class CommentListSerializer(serializers.ListSerializer):
+    """
+    Resolves `following` of all comment authors with a single query, unless
+    the view has already put them into the context.
+    """
+
+    def to_representation(self, data):
+        comments = list(data.all() if isinstance(data, models.Manager) else data)
+        user = self.context.get('user', None)
+        if user and user.is_authenticated and self.context.get('followee_ids', None) is None:
+            author_pks = {comment.author_id for comment in comments}
+            self.context['followee_ids'] = user.profile.get_followee_ids(author_pks)
+        return super(CommentListSerializer, self).to_representation(comments)
+
+
 class CommentSerializer(serializers.ModelSerializer):
     author = ProfileSerializer(read_only=True)
     createdAt = serializers.SerializerMethodField(method_name='get_created_at')
@@ -20,6 +34,7 @@ class CommentSerializer(serializers.ModelSerializer):
         model = Comment
         fields = ['id', 'title', 'body', 'createdAt', 'updatedAt', 'author']
         read_only_fields = ['id']
+        list_serializer_class = CommentListSerializer
 
     def validate(self, args):
         user = self.context.get('user', None)
@@ -64,11 +79,40 @@ class TagSerializer(serializers.ModelSerializer):
         return tag
 
 
+class TagCountSerializer(serializers.ModelSerializer):
+    tag = serializers.CharField(source='body', read_only=True)
+    postsCount = serializers.IntegerField(source='posts_count', read_only=True)
+
+    class Meta:
+        model = Tag
+        fields = ['tag', 'postsCount']
+
+
+class PostListSerializer(serializers.ListSerializer):
+    """
+    Resolves `favorited` and author's `following` for the whole page at once:
+    favorite post ids and followee ids of the request maker are loaded with
+    a single query each and shared with every child serializer through the
+    context.
+    """
+
+    def to_representation(self, data):
+        posts = list(data.all() if isinstance(data, models.Manager) else data)
+        user = self.context.get('user', None)
+        if user and user.is_authenticated:
+            profile = user.profile
+            self.context['favorited_ids'] = profile.get_favorited_ids([post.pk for post in posts])
+            self.context['followee_ids'] = profile.get_followee_ids({post.author_id for post in posts})
+        return super(PostListSerializer, self).to_representation(posts)
+
+
 class PostSerializer(serializers.ModelSerializer):
     createdAt = serializers.SerializerMethodField(method_name='get_created_at')
     updatedAt = serializers.SerializerMethodField(method_name='get_updated_at')
-    likes = serializers.SerializerMethodField()
-    dislikes = serializers.SerializerMethodField()
+    likes = serializers.IntegerField(source='likes_count', read_only=True)
+    dislikes = serializers.IntegerField(source='dislikes_count', read_only=True)
+    favoritesCount = serializers.IntegerField(source='favorites_count', read_only=True)
+    commentsCount = serializers.IntegerField(source='comments_count', read_only=True)
     favorited = serializers.SerializerMethodField()
     author = ProfileSerializer(read_only=True)
     tagList = TagSerializer(many=True, required=False, source='tags')
@@ -77,9 +121,11 @@ class PostSerializer(serializers.ModelSerializer):
         model = Post
         fields = [
             'slug', 'title', 'body', 'tagList', 'createdAt', 'updatedAt',
-            'favorited', 'likes', 'dislikes', 'author'
+            'favorited', 'favoritesCount', 'likes', 'dislikes', 'commentsCount',
+            'author'
         ]
         read_only_fields = ['slug']
+        list_serializer_class = PostListSerializer
 
     def validate(self, args):
         if args == {}:
@@ -90,46 +136,42 @@ class PostSerializer(serializers.ModelSerializer):
             msg = _('You must pass a valid user in order to perform this operation.')
             raise ValidationError(msg)
         args['author'] = user.profile
-        args['slug'] = unique_slugify(
-            model=self.Meta.model,
-            text=args['title']
-        )
         return args
 
     def create(self, validated_data):
         tag_data_list = validated_data.pop('tags', [])
-        post = Post.objects.create(**validated_data)
-        for tag_data in tag_data_list:
-            tag = Tag.objects.get_or_create(**tag_data)[0]
-            post.tags.add(tag)
+        post = Post(**validated_data)
+        post.save_with_new_slug()
+        if tag_data_list:
+            post.tags.add(*Tag.objects.get_or_create_all(tag['body'] for tag in tag_data_list))
         return post
 
     def update(self, instance, validated_data):
         new_tags = validated_data.pop('tags', [])
+        title_changed = validated_data.get('title', instance.title) != instance.title
         for key, value in validated_data.items():
             setattr(instance, key, value)
         if new_tags:
-            old_tags = {tag['body'] for tag in instance.tags.values('body')}
+            old_tags = list(instance.tags.all())
             new_tags = {tag['body'] for tag in new_tags}
-            tags_to_add = new_tags.difference(old_tags)
-            tags_to_remove = old_tags.difference(new_tags)
-            for tag_body in tags_to_add:
-                tag = Tag.objects.get_or_create(body=tag_body)[0]
-                instance.tags.add(tag)
-            for tag_body in tags_to_remove:
-                tag = Tag.objects.get(body=tag_body)
-                instance.tags.remove(tag)
+            tags_to_add = new_tags.difference(tag.body for tag in old_tags)
+            tags_to_remove = [tag for tag in old_tags if tag.body not in new_tags]
+            if tags_to_add:
+                instance.tags.add(*Tag.objects.get_or_create_all(tags_to_add))
+            if tags_to_remove:
+                instance.tags.remove(*tags_to_remove)
+        if title_changed:
+            instance.save_with_new_slug()
+        else:
+            instance.save()
         return instance
 
-    def get_likes(self, post):
-        return post.get_likes()
-
-    def get_dislikes(self, post):
-        return post.get_dislikes()
-
     def get_favorited(self, post):
         user = self.context.get('user', None)
         if user and user.is_authenticated:
+            favorited_ids = self.context.get('favorited_ids', None)
+            if favorited_ids is not None:
+                return post.pk in favorited_ids
             return user.profile.has_in_favorites(post)
         return False
 
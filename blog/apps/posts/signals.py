@@ -0,0 +1,64 @@
+from django.db.models import F
+from django.db.models.signals import m2m_changed, post_delete, post_save, pre_delete
+from django.dispatch import receiver
+
+from apps.posts import search
+from apps.posts.models import Comment, FeedEntry, Post, Tag
+
+
+@receiver(post_save, sender=Comment)
+def count_created_comment(sender, instance, created, raw=False, **kwargs):
+    # fixtures carry counters of their own
+    if created and not raw:
+        instance.post.change_counters(comments_count=1)
+
+
+@receiver(post_save, sender=Post)
+def fan_out_created_post(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        FeedEntry.objects.fan_out(instance)
+
+
+@receiver(post_save, sender=Post)
+def index_saved_post(sender, instance, **kwargs):
+    search.index_post(instance)
+
+
+@receiver(post_delete, sender=Post)
+def unindex_deleted_post(sender, instance, **kwargs):
+    search.unindex_post(instance.pk)
+
+
+@receiver(m2m_changed, sender=Post.tags.through)
+def count_tagged_posts(sender, instance, action, reverse, pk_set, **kwargs):
+    """
+    Keeps Tag.posts_count in sync with the links added or removed from either
+    side, `post.tags` or `tag.posts`.
+    """
+    links = sender.objects.filter(**{'tag' if reverse else 'post': instance})
+    if action in ('pre_remove', 'pre_clear'):
+        # pk_set of removal holds whatever was asked for, and clear doesn't
+        # have one at all, so remember the links which really exist
+        if pk_set is not None:
+            links = links.filter(**{'post__in' if reverse else 'tag__in': pk_set})
+        instance._removed_tag_links = list(links.values_list('post_id', 'tag_id'))
+        return
+    if action == 'post_add' and pk_set:
+        delta, pks = 1, pk_set
+    elif action in ('post_remove', 'post_clear'):
+        delta, removed = -1, instance.__dict__.pop('_removed_tag_links', [])
+        pks = [post_id if reverse else tag_id for post_id, tag_id in removed]
+    else:
+        return
+    if not pks:
+        return
+    if reverse:
+        Tag.objects.filter(pk=instance.pk).update(posts_count=F('posts_count') + delta * len(pks))
+    else:
+        Tag.objects.filter(pk__in=pks).update(posts_count=F('posts_count') + delta)
+
+
+@receiver(pre_delete, sender=Post)
+def uncount_deleted_post_tags(sender, instance, **kwargs):
+    # the cascade deletes the links without m2m_changed signals
+    Tag.objects.filter(posts=instance).update(posts_count=F('posts_count') - 1)
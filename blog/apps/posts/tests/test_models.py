@@ -1,7 +1,13 @@
+from io import StringIO
+from unittest import mock
+
 from django.core.exceptions import ValidationError
+from django.core.management import call_command
+from django.db import IntegrityError, connection
+from django.db.models import F
 from django.test import TestCase
 
-from apps.posts.models import Post, Comment, Tag
+from apps.posts.models import Comment, FeedEntry, Post, Tag
 
 from apps.profiles.models import Profile
 
@@ -74,6 +80,60 @@ class PostModelTests(TestCase):
         )
         self.assertEqual(str(post), post.title)
 
+    def test_save_with_new_slug(self):
+        author = Profile.objects.get(user__username='kenny')
+        post = Post(title='x' * 128, body='post body', author=author)
+        post.save_with_new_slug()
+        self.assertLessEqual(len(post.slug), 128)
+        self.assertTrue(Post.objects.filter(slug=post.slug).exists())
+
+    def test_save_with_new_slug_collision(self):
+        author = Profile.objects.get(user__username='kenny')
+        taken = Post.objects.first().slug
+        post = Post(title='Second post', body='post body', author=author)
+        with mock.patch('apps.posts.models.random_slugify', side_effect=[taken, 'second-post-1']):
+            post.save_with_new_slug()
+        self.assertEqual(post.slug, 'second-post-1')
+        with mock.patch('apps.posts.models.random_slugify', return_value=taken):
+            with self.assertRaises(IntegrityError):
+                Post(title='Third post', body='post body', author=author).save_with_new_slug()
+
+    def test_counters_match_fixtures(self):
+        drifted = Post.objects.with_actual_counters().exclude(
+            **{counter: F('actual_' + counter) for counter in Post.COUNTERS}
+        )
+        self.assertFalse(drifted.exists())
+
+    def test_comment_counters(self):
+        post = Post.objects.first()
+        comments_before = post.comments_count
+        comment = Comment.objects.create(
+            title='title', body='body', post=post, author=post.author
+        )
+        post.refresh_from_db()
+        self.assertEqual(post.comments_count - comments_before, 1)
+        comment.delete()
+        post.refresh_from_db()
+        self.assertEqual(post.comments_count, comments_before)
+
+    def test_delete_post_with_comments(self):
+        post = Post.objects.first()
+        Comment.objects.bulk_create(
+            Comment(title='title', body='body', post=post, author=post.author) for i in range(50)
+        )
+        # comments are fast deleted by the cascade, without loading them
+        with self.assertNumQueries(10):
+            post.delete()
+        self.assertFalse(Comment.objects.filter(post_id=post.pk).exists())
+
+    def test_reconcile_counters_command(self):
+        post = Post.objects.first()
+        Post.objects.filter(pk=post.pk).update(comments_count=100, likes_count=5)
+        call_command('reconcile_post_counters', stdout=StringIO())
+        post.refresh_from_db()
+        self.assertEqual(post.comments_count, post.comments.count())
+        self.assertEqual(post.likes_count, post.get_likes())
+
 
 class CommentModelTests(TestCase):
 
@@ -110,3 +170,110 @@ class TagModelTests(TestCase):
         )
         with self.assertRaises(ValidationError):
             duplicate.full_clean()
+
+    def test_get_or_create_all(self):
+        existing = Tag.objects.create(body='existing')
+        tags = Tag.objects.get_or_create_all(['existing', 'new', 'new'])
+        self.assertEqual(sorted(tag.body for tag in tags), ['existing', 'new'])
+        self.assertIn(existing, tags)
+        self.assertEqual(Tag.objects.count(), 2)
+        with self.assertNumQueries(1):
+            Tag.objects.get_or_create_all(['existing', 'new'])
+
+
+class TagCounterTests(TestCase):
+
+    fixtures = ['posts.json']
+
+    def assertCountersMatch(self):
+        drifted = Tag.objects.with_actual_counters().exclude(posts_count=F('actual_posts_count'))
+        self.assertFalse(drifted.exists())
+
+    def test_counters_match_fixtures(self):
+        self.assertCountersMatch()
+
+    def test_add_and_remove_tags(self):
+        post = Post.objects.first()
+        tag = Tag.objects.create(body='counted')
+        post.tags.add(tag)
+        post.tags.add(tag)
+        tag.refresh_from_db()
+        self.assertEqual(tag.posts_count, 1)
+        post.tags.remove(tag, Tag.objects.exclude(posts=post).exclude(pk=tag.pk).first())
+        tag.refresh_from_db()
+        self.assertEqual(tag.posts_count, 0)
+        self.assertCountersMatch()
+
+    def test_clear_and_reverse_tags(self):
+        post = Post.objects.first()
+        tag = Tag.objects.create(body='counted')
+        tag.posts.add(*Post.objects.all())
+        tag.refresh_from_db()
+        self.assertEqual(tag.posts_count, Post.objects.count())
+        post.tags.clear()
+        tag.posts.remove(Post.objects.last())
+        self.assertCountersMatch()
+
+    def test_post_delete(self):
+        Post.objects.first().delete()
+        self.assertCountersMatch()
+
+    def test_reconcile_counters_command(self):
+        Tag.objects.update(posts_count=100)
+        call_command('reconcile_post_counters', stdout=StringIO())
+        self.assertCountersMatch()
+
+
+class FeedEntryModelTests(TestCase):
+
+    fixtures = ['posts.json']
+
+    def test_fan_out_on_create(self):
+        author = Profile.objects.get(user__username='kenny')
+        follower = Profile.objects.get(user__username='kyle')
+        follower.follow(author)
+        post = Post.objects.create(
+            slug='new-post',
+            title='New post',
+            body='blah blah blah...',
+            author=author
+        )
+        self.assertTrue(
+            FeedEntry.objects.filter(owner=follower, post=post, created_at=post.created_at).exists()
+        )
+        self.assertFalse(FeedEntry.objects.filter(owner=author, post=post).exists())
+
+    def test_backfill_on_follow(self):
+        author = Profile.objects.get(user__username='kenny')
+        follower = Profile.objects.get(user__username='kyle')
+        follower.unfollow(author)
+        self.assertFalse(FeedEntry.objects.filter(owner=follower, post__author=author).exists())
+        follower.follow(author)
+        self.assertEqual(
+            FeedEntry.objects.filter(owner=follower, post__author=author).count(),
+            author.posts.count()
+        )
+
+    def test_prune_on_unfollow(self):
+        author = Profile.objects.get(user__username='kenny')
+        follower = Profile.objects.get(user__username='kyle')
+        follower.follow(author)
+        follower.unfollow(author)
+        self.assertFalse(FeedEntry.objects.filter(owner=follower, post__author=author).exists())
+
+
+class IndexBenchmarkTests(TestCase):
+
+    def post_indexes(self):
+        with connection.cursor() as cursor:
+            return set(connection.introspection.get_constraints(cursor, Post._meta.db_table))
+
+    def test_benchmark_rolls_back_seed_and_dropped_indexes(self):
+        indexes = self.post_indexes()
+        out = StringIO()
+        call_command('benchmark_indexes', posts=50, authors=5, comments=3, repeat=1, stdout=out)
+        self.assertIn('dropped', out.getvalue())
+        self.assertFalse(Post.objects.exists())
+        self.assertEqual(self.post_indexes(), indexes)
+        for index in Post._meta.indexes:
+            self.assertIn(index.name, indexes)
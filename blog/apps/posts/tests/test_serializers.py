@@ -1,4 +1,6 @@
+from django.db import connection
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
 
 from apps.authentication.models import User
 from apps.posts.models import Comment, Post, Tag
@@ -28,6 +30,16 @@ class CommentSerializerTests(TestCase):
         self.assertEqual(qset.count(), len(qset_data))
         self.assertEqual(comment_data, qset_data[0])
 
+    def test_serialize_multiple_comments_following(self):
+        user = User.objects.get(username='eric')
+        qset = Comment.objects.all()
+        data = CommentSerializer(qset, many=True, context={'user': user}).data
+        for comment, entry in zip(qset, data):
+            self.assertEqual(
+                entry['author']['following'],
+                user.profile.has_in_followees(comment.author)
+            )
+
     def test_deserialize_comment(self):
         user = User.objects.get(username='eric')
         post = Post.objects.first()
@@ -119,6 +131,14 @@ class PostSerializerTests(TestCase):
         self.assertEqual(len(qset_data), queryset.count())
         self.assertEqual(post_data, qset_data[0])
 
+    def test_serialize_multiple_posts_favorited(self):
+        user = User.objects.get(username='kenny')
+        queryset = Post.objects.all()
+        user.profile.favorite(queryset.first())
+        data = PostSerializer(queryset, many=True, context={'user': user}).data
+        for post, entry in zip(queryset, data):
+            self.assertEqual(entry['favorited'], user.profile.has_in_favorites(post))
+
     def test_deserialize_with_tags(self):
         user = User.objects.get(username='kenny')
         tags_list = ['sometag1', 'sometag2', 'sometag3']
@@ -138,6 +158,26 @@ class PostSerializerTests(TestCase):
         for tag in tags_qset:
             self.assertIn(tag, post.tags.all())
 
+    def test_deserialize_tags_constant_queries(self):
+        user = User.objects.get(username='kenny')
+        existing = list(Tag.objects.values_list('body', flat=True)[:2])
+        queries = []
+        for num, tags_num in enumerate((3, 20)):
+            serializer = PostSerializer(
+                data={
+                    'tagList': existing + ['new{}-{}'.format(num, i) for i in range(tags_num)],
+                    'title': 'Some random title',
+                    'body': 'Here goes post body',
+                },
+                context={'user': user}
+            )
+            self.assertTrue(serializer.is_valid())
+            with CaptureQueriesContext(connection) as context:
+                post = serializer.save()
+            queries.append(len(context))
+            self.assertEqual(post.tags.count(), tags_num + len(existing))
+        self.assertEqual(queries[0], queries[1])
+
     def test_deserialize_without_tags(self):
         user = User.objects.get(username='kenny')
         serializer = PostSerializer(
@@ -209,6 +249,52 @@ class PostSerializerTests(TestCase):
         self.assertEqual(post.get_likes(), data['likes'])
         self.assertEqual(post.get_dislikes(), data['dislikes'])
         self.assertEqual(post.tags.count(), len(data['tagList']))
+        post.refresh_from_db()
+        self.assertEqual(post.title, new_data['title'])
+        self.assertEqual(post.body, new_data['body'])
+
+    def test_update_post_tags(self):
+        post = Post.objects.filter(tags__isnull=False).first()
+        kept = post.tags.first().body
+        serializer = PostSerializer(
+            post,
+            data={'tagList': [kept, 'upd1']},
+            context={'user': post.author.user},
+            partial=True
+        )
+        self.assertTrue(serializer.is_valid())
+        serializer.save()
+        self.assertEqual(
+            set(post.tags.values_list('body', flat=True)), {kept, 'upd1'}
+        )
+
+    def test_update_post_keeps_slug(self):
+        post = Post.objects.first()
+        slug = post.slug
+        serializer = PostSerializer(
+            post,
+            data={'title': post.title, 'body': 'modified body'},
+            context={'user': post.author.user},
+            partial=True
+        )
+        self.assertTrue(serializer.is_valid())
+        serializer.save()
+        post.refresh_from_db()
+        self.assertEqual(post.slug, slug)
+        self.assertEqual(post.body, 'modified body')
+
+    def test_update_post_title_changes_slug(self):
+        post = Post.objects.first()
+        serializer = PostSerializer(
+            post,
+            data={'title': 'brand new title'},
+            context={'user': post.author.user},
+            partial=True
+        )
+        self.assertTrue(serializer.is_valid())
+        serializer.save()
+        post.refresh_from_db()
+        self.assertTrue(post.slug.startswith('brand-new-title-'))
 
 
 class TagSerializerTests(TestCase):
@@ -1,15 +1,25 @@
 import json
+import jwt
 import random
 
+from datetime import datetime, timedelta
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connection
 from django.shortcuts import reverse
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
 
 from rest_framework import status
 
 from apps.authentication.models import User
 from apps.core.tests.factories import PostFactory, TagFactory, UserFactory
-from apps.posts.models import Comment, Post, Tag
+from apps.posts.models import Comment, FeedEntry, Post, Tag
 from apps.posts.pagination import PostsPaginaton
+from apps.posts.serializers import PostSerializer
+from apps.profiles.models import Profile
 
 
 class TagViewTests(TestCase):
@@ -23,6 +33,66 @@ class TagViewTests(TestCase):
         data = set(response.data.get('tagList'))
         self.assertEqual(tags_list, data)
 
+    def test_list_tags_not_modified(self):
+        response = self.client.get(reverse('posts:listtags_view'))
+        etag = response['ETag']
+        response = self.client.get(reverse('posts:listtags_view'), HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+        Tag.objects.create(body='new tag')
+        response = self.client.get(reverse('posts:listtags_view'), HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        etag = response['ETag']
+        Post.objects.first().tags.add(Tag.objects.get(body='new tag'))
+        response = self.client.get(reverse('posts:listtags_view'), HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def test_list_tags_by_popularity(self):
+        expected = list(Tag.objects.order_by('-posts_count', 'id').values_list('body', flat=True))
+        response = self.client.get(reverse('posts:listtags_view') + '?limit=2')
+        self.assertEqual(response.data['tagList'], expected[:2])
+        self.assertEqual(response.data['tagsCount'], len(expected))
+        response = self.client.get(response.data['next'])
+        self.assertEqual(response.data['tagList'], expected[2:4])
+
+    def test_list_tags_with_counts(self):
+        response = self.client.get(reverse('posts:listtags_view') + '?counts=true')
+        for entry in response.data['tagList']:
+            self.assertEqual(
+                entry['postsCount'], Post.objects.filter(tags__body=entry['tag']).count()
+            )
+
+    def test_list_tags_cursor(self):
+        expected = list(Tag.objects.order_by('-posts_count', 'id').values_list('body', flat=True))
+        url = reverse('posts:listtags_view') + '?pagination=cursor&limit=3'
+        tags = []
+        while url:
+            response = self.client.get(url)
+            self.assertNotIn('tagsCount', response.data)
+            tags.extend(response.data['tagList'])
+            url = response.data['next']
+        self.assertEqual(tags, expected)
+
+    def test_list_tags_cursor_ties(self):
+        Tag.objects.bulk_create(Tag(body='tie{}'.format(i)) for i in range(1100))
+        expected = list(Tag.objects.order_by('-posts_count', 'id').values_list('body', flat=True))
+        url = reverse('posts:listtags_view') + '?pagination=cursor&limit=100'
+        pages = []
+        while url:
+            response = self.client.get(url)
+            pages.append(response.data['tagList'])
+            url = response.data['next']
+        self.assertEqual(sum(pages, []), expected)
+        url = response.data['previous']
+        for page in reversed(pages[:-1]):
+            response = self.client.get(url)
+            self.assertEqual(response.data['tagList'], page)
+            url = response.data['previous']
+        self.assertIsNone(url)
+
+    def test_list_tags_invalid_cursor(self):
+        response = self.client.get(reverse('posts:listtags_view') + '?pagination=cursor&cursor=bogus')
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
 
 class PostViewSetTests(TestCase):
 
@@ -30,6 +100,7 @@ class PostViewSetTests(TestCase):
     posts_num = 30
 
     def setUp(self):
+        cache.clear()
         self.users = []
         self.tags = []
         for x in range(self.users_num):
@@ -111,6 +182,116 @@ class PostViewSetTests(TestCase):
             Post.objects.all().order_by('-created_at', '-modified_at')[offset].title
         )
 
+    def test_list_without_count(self):
+        posts_count = Post.objects.count()
+        slugs = []
+        url = reverse('posts:post-list') + '?count=false&limit=7'
+        while url:
+            response = self.client.get(url, content_type='application/json')
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            self.assertNotIn('postsCount', response.data)
+            slugs.extend(entry['slug'] for entry in response.data['posts'])
+            url = response.data['next']
+        self.assertEqual(len(set(slugs)), posts_count)
+
+    def test_list_count_cached(self):
+        url = reverse('posts:post-list')
+        response = self.client.get(url, content_type='application/json')
+        posts_count = response.data['postsCount']
+        PostFactory(author=self.users[0].profile)
+        response = self.client.get(url, content_type='application/json')
+        self.assertEqual(response.data['postsCount'], posts_count)
+        response = self.client.get(url + '?author={}'.format(self.users[0]))
+        self.assertEqual(
+            response.data['postsCount'],
+            Post.objects.filter(author=self.users[0].profile).count()
+        )
+
+    def test_list_cursor_pagination(self):
+        slugs = []
+        url = reverse('posts:post-list') + '?pagination=cursor&limit=7'
+        while url:
+            response = self.client.get(url, content_type='application/json')
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            self.assertNotIn('postsCount', response.data)
+            self.assertLessEqual(len(response.data['posts']), 7)
+            slugs.extend(entry['slug'] for entry in response.data['posts'])
+            url = response.data['next']
+        expected = Post.objects.order_by('-created_at', '-id').values_list('slug', flat=True)
+        self.assertEqual(slugs, list(expected))
+
+    def test_feed_with_popular_author(self):
+        reader, author, other = self.users[:3]
+        with self.settings(FEED_FANOUT_FOLLOWERS_LIMIT=0):
+            reader.profile.follow(author.profile)
+        author.profile.refresh_from_db()
+        self.assertTrue(author.profile.is_popular)
+        post = PostFactory(author=author.profile)
+        self.assertFalse(FeedEntry.objects.filter(post=post).exists())
+        reader.profile.follow(other.profile)
+        expected = Post.objects.filter(author__in=reader.profile.followees.all())
+        headers = {
+            'HTTP_AUTHORIZATION': 'Bearer ' + reader.token
+        }
+        response = self.client.get(
+            reverse('posts:post-feed') + '?limit=100',
+            content_type='application/json',
+            **headers
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['postsCount'], expected.count())
+        self.assertEqual(
+            [entry['slug'] for entry in response.data['posts']],
+            list(expected.order_by('-created_at', '-id').values_list('slug', flat=True))
+        )
+
+    def test_feed_with_popular_author_pages(self):
+        reader, author, other = self.users[:3]
+        with self.settings(FEED_FANOUT_FOLLOWERS_LIMIT=0):
+            reader.profile.follow(author.profile)
+        reader.profile.follow(other.profile)
+        for i in range(5):
+            PostFactory(author=author.profile)
+            PostFactory(author=other.profile)
+        expected = list(
+            Post.objects.filter(author__in=reader.profile.followees.all()).order_by(
+                '-created_at', '-id'
+            ).values_list('slug', flat=True)
+        )
+        headers = {
+            'HTTP_AUTHORIZATION': 'Bearer ' + reader.token
+        }
+        for query in ('?limit=3', '?limit=3&count=false', '?limit=3&pagination=cursor'):
+            url = reverse('posts:post-feed') + query
+            pages = []
+            while url:
+                response = self.client.get(url, **headers)
+                self.assertEqual(response.status_code, status.HTTP_200_OK)
+                pages.append([entry['slug'] for entry in response.data['posts']])
+                url = response.data['next']
+            self.assertEqual(sum(pages, []), expected)
+            if 'count=false' not in query and 'cursor' not in query:
+                self.assertEqual(response.data['postsCount'], len(expected))
+            url = response.data['previous']
+            for page in reversed(pages[:-1]):
+                response = self.client.get(url, **headers)
+                self.assertEqual([entry['slug'] for entry in response.data['posts']], page)
+                url = response.data['previous']
+
+    def test_feed_cursor_pagination(self):
+        user = self.users[0]
+        headers = {
+            'HTTP_AUTHORIZATION': 'Bearer ' + user.token
+        }
+        response = self.client.get(
+            reverse('posts:post-feed') + '?pagination=cursor',
+            content_type='application/json',
+            **headers
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertIsNone(response.data['previous'])
+        self.assertNotIn('postsCount', response.data)
+
     def test_feed(self):
         user = self.users[0]
         posts_count = Post.objects.filter(author__in=user.profile.followees.all()).count()
@@ -135,6 +316,45 @@ class PostViewSetTests(TestCase):
         self.assertEqual(response.status_code, status.HTTP_200_OK)
         self.assertEqual(data['title'], post.title)
 
+    def test_retrieve_post_matches_serializer(self):
+        user, voter = self.users[:2]
+        post = Post.objects.exclude(author__in=[user.profile, voter.profile]).first()
+        user.profile.follow(post.author)
+        user.profile.favorite(post)
+        url = reverse('posts:post-detail', kwargs={'slug': post.slug})
+        headers = {
+            'HTTP_AUTHORIZATION': 'Bearer ' + user.token
+        }
+        self.client.get(url, content_type='application/json', **headers)
+        # counters change without post modification, so the cache must not hide it
+        voter.profile.like(post)
+        response = self.client.get(url, content_type='application/json', **headers)
+        post.refresh_from_db()
+        self.assertEqual(response.data['post'], PostSerializer(post, context={'user': user}).data)
+        self.assertTrue(response.data['post']['favorited'])
+        self.assertTrue(response.data['post']['author']['following'])
+
+    def test_retrieve_post_after_update(self):
+        post = Post.objects.first()
+        url = reverse('posts:post-detail', kwargs={'slug': post.slug})
+        self.client.get(url, content_type='application/json')
+        post.body = 'updated body'
+        post.save()
+        response = self.client.get(url, content_type='application/json')
+        self.assertEqual(response.data['post']['body'], 'updated body')
+
+    def test_retrieve_post_not_modified(self):
+        post = Post.objects.first()
+        url = reverse('posts:post-detail', kwargs={'slug': post.slug})
+        etag = self.client.get(url)['ETag']
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+        self.assertFalse(response.content)
+        voter = User.objects.exclude(profile=post.author).first()
+        voter.profile.like(post)
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
     def test_retrieve_post_wrong_slug(self):
         response = self.client.get(
             reverse('posts:post-detail', kwargs={'slug': 'mock slug'}),
@@ -200,6 +420,26 @@ class PostViewSetTests(TestCase):
         )
         self.assertEqual(response.status_code, status.HTTP_200_OK)
 
+    def test_update_own_post_minimal(self):
+        user = User.objects.first()
+        post = user.profile.posts.first()
+        headers = {
+            'HTTP_AUTHORIZATION': 'Bearer ' + user.token,
+            'HTTP_PREFER': 'return=minimal'
+        }
+        response = self.client.put(
+            reverse('posts:post-detail', kwargs={'slug': post.slug}),
+            data=json.dumps({'post': {'title': 'minimal post'}}),
+            content_type='application/json',
+            **headers
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response['Preference-Applied'], 'return=minimal')
+        post.refresh_from_db()
+        self.assertEqual(response.data['post'], {
+            'slug': post.slug, 'updatedAt': post.modified_at.isoformat()
+        })
+
     def test_update_own_post_no_data(self):
         user = User.objects.first()
         post = user.profile.posts.first()
@@ -289,6 +529,32 @@ class PostViewSetTests(TestCase):
         )
         self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
 
+    def test_delete_posts_with_token_without_profile_claim(self):
+        owner = User.objects.first()
+        posts = list(owner.profile.posts.all()[:2])
+        token = jwt.encode(
+            {'id': owner.pk, 'exp': datetime.timestamp(datetime.now() + timedelta(hours=1))},
+            settings.SECRET_KEY,
+            algorithm='HS256'
+        ).decode('utf-8')
+        headers = {
+            'HTTP_AUTHORIZATION': 'Bearer ' + token
+        }
+        response = self.client.delete(
+            reverse('posts:post-detail', kwargs={'slug': posts[0].slug}),
+            **headers
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        modifier = User.objects.last()
+        headers = {
+            'HTTP_AUTHORIZATION': 'Bearer ' + modifier.token
+        }
+        response = self.client.delete(
+            reverse('posts:post-detail', kwargs={'slug': posts[1].slug}),
+            **headers
+        )
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
     def test_delete_post_unauth(self):
         user = User.objects.first()
         post = user.profile.posts.first()
@@ -389,6 +655,31 @@ class PostViewSetTests(TestCase):
         self.assertEqual(response.status_code, status.HTTP_200_OK)
         self.assertEqual(likes_after - likes_before, 1)
 
+    def test_like_and_favorite_post_minimal(self):
+        post = User.objects.first().profile.posts.first()
+        voter = User.objects.last()
+        voter.profile.unfavorite(post)
+        headers = {
+            'HTTP_AUTHORIZATION': 'Bearer ' + voter.token
+        }
+        response = self.client.post(
+            reverse('posts:post-like', kwargs={'slug': post.slug}) + '?return=minimal',
+            **headers
+        )
+        self.assertEqual(response['Preference-Applied'], 'return=minimal')
+        self.assertEqual(response.data['post'], {
+            'slug': post.slug, 'likes': post.get_likes(), 'dislikes': post.get_dislikes()
+        })
+        response = self.client.post(
+            reverse('posts:post-favorite', kwargs={'slug': post.slug}),
+            HTTP_PREFER='respond-async, return=minimal',
+            **headers
+        )
+        self.assertEqual(response['Preference-Applied'], 'return=minimal')
+        self.assertEqual(response.data['post'], {
+            'slug': post.slug, 'favorited': True, 'favoritesCount': post.favorited_by.count()
+        })
+
     def test_like_post_unauth(self):
         post = Post.objects.first()
         response = self.client.post(
@@ -511,6 +802,56 @@ class CommentCreateListViewTests(TestCase):
         comments = response.data['comments']
         self.assertEqual(response.status_code, status.HTTP_200_OK)
         self.assertEqual(len(comments), post.comments.count())
+        self.assertEqual(response.data['commentsCount'], post.comments_count)
+
+    def test_list_comments_pages(self):
+        post = Post.objects.first()
+        expected = list(post.comments.order_by('created_at', 'id').values_list('pk', flat=True))
+        url = reverse('posts:comments_view', kwargs={'slug': post.slug}) + '?limit=1'
+        pks = []
+        while url:
+            response = self.client.get(url)
+            self.assertLessEqual(len(response.data['comments']), 1)
+            pks.extend(comment['id'] for comment in response.data['comments'])
+            url = response.data['next']
+        self.assertEqual(pks, expected)
+
+    def test_list_comments_constant_queries(self):
+        post = Post.objects.first()
+        user = User.objects.first()
+        headers = {
+            'HTTP_AUTHORIZATION': 'Bearer ' + user.token
+        }
+        url = reverse('posts:comments_view', kwargs={'slug': post.slug})
+        with CaptureQueriesContext(connection) as few:
+            self.client.get(url, **headers)
+        for profile in Profile.objects.all():
+            for i in range(10):
+                Comment.objects.create(title='title', body='body', post=post, author=profile)
+        with CaptureQueriesContext(connection) as many:
+            response = self.client.get(url, **headers)
+        self.assertEqual(len(response.data['comments']), 20)
+        self.assertEqual(len(few), len(many))
+
+    def test_list_comments_not_modified(self):
+        post = Post.objects.first()
+        url = reverse('posts:comments_view', kwargs={'slug': post.slug})
+        user = User.objects.first()
+        headers = {
+            'HTTP_AUTHORIZATION': 'Bearer ' + user.token
+        }
+        etag = self.client.get(url, **headers)['ETag']
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag, **headers)
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+        author = post.comments.first().author
+        author.about = 'changed'
+        author.save()
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag, **headers)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        etag = response['ETag']
+        user.profile.follow(User.objects.last().profile)
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag, **headers)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
 
     def test_list_comments_wrong_slug(self):
         response = self.client.get(
@@ -587,3 +928,171 @@ class CommentDestroyViewTests(TestCase):
         self.assertTrue(
             Comment.objects.filter(pk=pk).exists()
         )
+
+
+class PostSearchTests(TestCase):
+
+    fixtures = ['posts.json']
+
+    def setUp(self):
+        cache.clear()
+        self.author = Profile.objects.get(user__username='kenny')
+        self.in_title = Post.objects.create(
+            slug='in-title', title='Pelican migration', body='Notes from the coast', author=self.author
+        )
+        self.in_body = Post.objects.create(
+            slug='in-body', title='Coast notes', body='A pelican flew by', author=self.author
+        )
+
+    def _search(self, text):
+        response = self.client.get(reverse('posts:post-list') + '?q=' + text)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return [post['slug'] for post in response.data['posts']]
+
+    def test_search_ranked(self):
+        self.assertEqual(self._search('pelican'), ['in-title', 'in-body'])
+        self.assertEqual(self._search('pelican flew'), ['in-body'])
+        self.assertEqual(self._search('albatross'), [])
+
+    def test_search_syntax_ignored(self):
+        self.assertEqual(set(self._search('pelican" (coast*')), {'in-title', 'in-body'})
+        self.assertEqual(self._search('"*"'), [])
+
+    def test_search_follows_updates(self):
+        self.in_body.body = 'An albatross flew by'
+        self.in_body.save()
+        self.assertEqual(self._search('albatross'), ['in-body'])
+        self.in_body.delete()
+        self.assertEqual(self._search('albatross'), [])
+
+
+class PostFilterTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        user = UserFactory()
+        user.save()
+        self.tags = {body: TagFactory(body=body) for body in ('beer', 'wine', 'cider')}
+        self.posts = {}
+        for days, (slug, tags) in enumerate([
+            ('beer-only', ['beer']),
+            ('beer-and-wine', ['beer', 'wine']),
+            ('all-three', ['beer', 'wine', 'cider']),
+            ('untagged', []),
+        ]):
+            post = PostFactory(author=user.profile, slug=slug)
+            post.tags.add(*[self.tags[body] for body in tags])
+            Post.objects.filter(pk=post.pk).update(
+                created_at=timezone.make_aware(datetime(2020, 1, 1 + days, 12))
+            )
+            self.posts[slug] = post
+
+    def _list(self, query, expected_status=status.HTTP_200_OK):
+        response = self.client.get(reverse('posts:post-list') + '?limit=20&' + query)
+        self.assertEqual(response.status_code, expected_status)
+        if expected_status != status.HTTP_200_OK:
+            return response.data['errors']
+        slugs = [post['slug'] for post in response.data['posts']]
+        self.assertEqual(response.data['postsCount'], len(slugs))
+        return slugs
+
+    def test_tags_any(self):
+        self.assertEqual(
+            self._list('tags=wine,cider'), ['all-three', 'beer-and-wine']
+        )
+        self.assertEqual(
+            self._list('tags=beer,wine,cider&match=any'), ['all-three', 'beer-and-wine', 'beer-only']
+        )
+
+    def test_tags_all(self):
+        self.assertEqual(self._list('tags=beer,wine&match=all'), ['all-three', 'beer-and-wine'])
+        self.assertEqual(self._list('tags=cider,beer,cider&match=all'), ['all-three'])
+        self.assertEqual(self._list('tags=beer,mead&match=all'), [])
+
+    def test_single_tag(self):
+        self.assertEqual(self._list('tag=beer'), ['all-three', 'beer-and-wine', 'beer-only'])
+
+    def test_empty_tags_ignored(self):
+        self.assertEqual(len(self._list('tags=,')), len(self.posts))
+        self.assertEqual(len(self._list('tags= ,&match=all')), len(self.posts))
+
+    def test_tags_unknown_match(self):
+        self.assertIn('match', self._list('tags=beer&match=most', status.HTTP_400_BAD_REQUEST))
+
+    def test_date_range(self):
+        self.assertEqual(self._list('since=2020-01-02'), ['untagged', 'all-three', 'beer-and-wine'])
+        self.assertEqual(self._list('until=2020-01-02T12:00:00'), ['beer-only'])
+        self.assertEqual(
+            self._list('since=2020-01-02&until=2020-01-04&tags=beer'), ['all-three', 'beer-and-wine']
+        )
+
+    def test_date_range_invalid(self):
+        self.assertIn('since', self._list('since=yesterday', status.HTTP_400_BAD_REQUEST))
+        self.assertIn('until', self._list('until=2020-13-01', status.HTTP_400_BAD_REQUEST))
+
+
+class PostQueryBudgetTests(TestCase):
+    """
+    Number of queries per endpoint must not depend on the number of posts
+    serialized.
+    """
+
+    posts_num = 20
+
+    def setUp(self):
+        self.user = UserFactory()
+        self.user.save()
+        for x in range(3):
+            author = UserFactory()
+            author.save()
+            self.user.profile.follow(author.profile)
+            for i in range(self.posts_num):
+                post = PostFactory(author=author.profile)
+                post.tags.add(TagFactory(), TagFactory())
+                self.user.profile.favorite(post)
+                self.user.profile.like(post)
+        self.headers = {
+            'HTTP_AUTHORIZATION': 'Bearer ' + self.user.token
+        }
+
+    def _assert_budget(self, budget, url, **headers):
+        for limit in (1, self.posts_num):
+            cache.clear()
+            with self.assertNumQueries(budget):
+                response = self.client.get(url + '?limit={}'.format(limit), **headers)
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def test_list_budget(self):
+        self._assert_budget(3, reverse('posts:post-list'))
+
+    def test_list_authenticated_budget(self):
+        self._assert_budget(6, reverse('posts:post-list'), **self.headers)
+
+    def test_feed_budget(self):
+        self._assert_budget(7, reverse('posts:post-feed'), **self.headers)
+
+    def test_retrieve_budget(self):
+        post = Post.objects.first()
+        url = reverse('posts:post-detail', kwargs={'slug': post.slug})
+        cache.clear()
+        with self.assertNumQueries(3):
+            self.client.get(url)
+        with self.assertNumQueries(1):
+            self.client.get(url)
+        with self.assertNumQueries(2):
+            self.client.get(url, **self.headers)
+        # the principal is cached now
+        with self.assertNumQueries(1):
+            self.client.get(url, **self.headers)
+
+    def test_favorite_budget(self):
+        post = Post.objects.first()
+        url = reverse('posts:post-favorite', kwargs={'slug': post.slug})
+        with self.assertNumQueries(7):
+            self.client.post(url, **self.headers)
+
+    def test_like_budget(self):
+        post = Post.objects.first()
+        url = reverse('posts:post-like', kwargs={'slug': post.slug})
+        with self.assertNumQueries(9):
+            self.client.post(url, **self.headers)
@@ -1,48 +1,125 @@
+from datetime import datetime
+
+from django.db.models import Q
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
+
 from rest_framework import status
 from rest_framework.decorators import detail_route, list_route
-from rest_framework.exceptions import PermissionDenied
+from rest_framework.exceptions import PermissionDenied, ValidationError
 from rest_framework.permissions import AllowAny, IsAuthenticated, IsAuthenticatedOrReadOnly
 from rest_framework.response import Response
 from rest_framework.generics import ListAPIView, ListCreateAPIView, DestroyAPIView
 from rest_framework.viewsets import ModelViewSet
 
-from apps.core.shortcuts import get_object_or_404
+from apps.core.conditional import conditional_response, make_etag
+from apps.core.prefer import minimal_response, prefers_minimal
+from apps.core.shortcuts import get_object_or_404, get_profile_id
+
+from .cache import get_post_state, render_post
+from .models import Comment, FeedEntry, Post, Tag
+from .serializers import CommentSerializer, PostSerializer, TagCountSerializer, TagSerializer
+from .pagination import (
+    CommentsCursorPagination, CursorPaginationMixin, KeysetPagination, PostsCursorPagination,
+    PostsPaginaton, TagsCursorPagination, TagsPagination
+)
+from .search import search
+
 
-from .models import Comment, Post, Tag
-from .serializers import CommentSerializer, PostSerializer, TagSerializer
-from .pagination import PostsPaginaton
+def _get_datetime_param(request, name):
+    """
+    Parses an ISO 8601 date or date and time from the query parameter, a date
+    means its midnight and a time without an offset is in the current time
+    zone. Raises ValidationError for malformed values.
+    """
+    value = request.GET.get(name, None)
+    if not value:
+        return None
+    try:
+        parsed = parse_datetime(value)
+        if parsed is None:
+            parsed = parse_date(value)
+            if parsed is not None:
+                parsed = datetime.combine(parsed, datetime.min.time())
+    except ValueError:
+        parsed = None
+    if parsed is None:
+        raise ValidationError({name: ['Enter a valid date or date and time in ISO 8601 format.']})
+    if timezone.is_naive(parsed):
+        parsed = timezone.make_aware(parsed)
+    return parsed
 
 
-class ListTagsAPIView(ListAPIView):
+class ListTagsAPIView(CursorPaginationMixin, ListAPIView):
+    """
+    Tags, most popular first. With `?counts=true` every tag comes with the
+    number of its posts.
+    """
     permission_classes = (AllowAny,)
     serializer_class = TagSerializer
-    queryset = Tag.objects.all()
+    queryset = Tag.objects.popular()
+    pagination_class = TagsPagination
+    cursor_pagination_class = TagsCursorPagination
+
+    def get_serializer_class(self):
+        if self.request.query_params.get('counts', '').lower() in ('true', '1', 'yes'):
+            return TagCountSerializer
+        return self.serializer_class
 
     def list(self, request):
-        response = super(ListTagsAPIView, self).list(self, request)
-        response.data = {'tagList': response.data}
-        return response
+        # a page is validated by its own rows, read by the same index range
+        # as the response, so the cost doesn't grow with the number of tags
+        page = self.paginate_queryset(self.get_queryset())
+        etag = make_etag(
+            request.get_full_path(),
+            [(tag.pk, tag.body, tag.posts_count) for tag in page],
+            getattr(self.paginator, 'count', None),
+            self.paginator.get_next_link(),
+            self.paginator.get_previous_link(),
+        )
+        return conditional_response(
+            request,
+            etag,
+            lambda: self.get_paginated_response(self.get_serializer(page, many=True).data)
+        )
 
 
-class PostViewSet(ModelViewSet):
+class PostViewSet(CursorPaginationMixin, ModelViewSet):
     serializer_class = PostSerializer
     permission_classes = (IsAuthenticatedOrReadOnly,)
     queryset = Post.objects.all()
     pagination_class = PostsPaginaton
+    cursor_pagination_class = PostsCursorPagination
     lookup_field = 'slug'
 
     def get_queryset(self):
         qset = super(PostViewSet, self).get_queryset()
         tag = self.request.GET.get('tag', None)
+        tags = self.request.GET.get('tags', None)
         author = self.request.GET.get('author', None)
         favorited = self.request.GET.get('favorited', None)
+        text = self.request.GET.get('q', None)
+        since = _get_datetime_param(self.request, 'since')
+        until = _get_datetime_param(self.request, 'until')
         if author:
             qset = qset.filter(author__user__username=author)
         if tag:
-            qset = qset.filter(tags__body=tag)
+            qset = qset.tagged([tag])
+        tags = [body.strip() for body in (tags or '').split(',') if body.strip()]
+        if tags:
+            match = self.request.GET.get('match', 'any')
+            if match not in ('any', 'all'):
+                raise ValidationError({'match': ['Must be "any" or "all".']})
+            qset = qset.tagged(tags, match_all=match == 'all')
+        if since:
+            qset = qset.filter(created_at__gte=since)
+        if until:
+            qset = qset.filter(created_at__lt=until)
         if favorited:
             qset = qset.filter(favorited_by__user__username=favorited)
-        return qset
+        if text:
+            qset = search(qset, text)
+        return qset.with_related()
 
     def create(self, request, *args, **kwargs):
         data = request.data.get('post', None)
@@ -56,9 +133,8 @@ class PostViewSet(ModelViewSet):
 
     def update(self, request, slug, *args, **kwargs):
         data = request.data.get('post', {})
-        post = get_object_or_404(Post, slug=slug)
-        request_maker = request.user.profile
-        if not request_maker.is_author_of(post):
+        post = get_object_or_404(Post.objects.with_related(), slug=slug)
+        if post.author_id != get_profile_id(request):
             raise PermissionDenied
         serializer = self.serializer_class(
             post,
@@ -68,10 +144,19 @@ class PostViewSet(ModelViewSet):
         )
         serializer.is_valid(raise_exception=True)
         serializer.save()
+        if prefers_minimal(request):
+            # slug changes along with the title
+            return minimal_response({'post': {
+                'slug': post.slug,
+                'updatedAt': serializer.get_updated_at(post)
+            }})
         return Response({'post': serializer.data}, status=status.HTTP_200_OK)
 
     def list(self, request, *args, **kwargs):
-        qset = self.get_queryset().order_by('-created_at', '-modified_at')
+        qset = self.get_queryset()
+        # search results come ordered by rank
+        if not self.request.GET.get('q', None):
+            qset = qset.order_by('-created_at', '-modified_at')
         page = self.paginate_queryset(qset)
         serializer = self.serializer_class(
             page,
@@ -82,42 +167,58 @@ class PostViewSet(ModelViewSet):
 
     def destroy(self, request, slug, *args, **kwargs):
         post = get_object_or_404(Post, slug=slug)
-        request_maker = request.user.profile
-        if not request_maker.is_author_of(post):
+        if post.author_id != get_profile_id(request):
             raise PermissionDenied
         post.delete()
         return Response(status=status.HTTP_200_OK)
 
     def retrieve(self, request, slug, *args, **kwargs):
-        post = get_object_or_404(Post, slug=slug)
-        serializer = self.serializer_class(
-            post,
-            context={'user': request.user}
+        state = get_post_state(slug, request.user)
+        return conditional_response(
+            request,
+            make_etag(sorted(state.items())),
+            lambda: Response({'post': render_post(state)}, status=status.HTTP_200_OK)
         )
-        return Response({'post': serializer.data}, status=status.HTTP_200_OK)
 
     @detail_route(methods=['POST', 'DELETE'], permission_classes=[IsAuthenticated], url_name='favorite')
     def favorite(self, request, slug):
-        post = get_object_or_404(Post, slug=slug)
+        minimal = prefers_minimal(request)
+        post = get_object_or_404(Post.objects.all() if minimal else Post.objects.with_related(), slug=slug)
         request_maker = request.user.profile
         if request.method == 'POST':
             request_maker.favorite(post)
         else:
             request_maker.unfavorite(post)
+        if minimal:
+            return minimal_response({'post': {
+                'slug': post.slug,
+                'favorited': request.method == 'POST',
+                'favoritesCount': post.favorites_count
+            }})
         serializer = self.serializer_class(
             post,
-            context={'user': request.user}
+            context={
+                'user': request.user,
+                'favorited_ids': {post.pk} if request.method == 'POST' else set()
+            }
         )
         return Response({'post': serializer.data}, status=status.HTTP_200_OK)
 
     @detail_route(methods=['POST', 'DELETE'], permission_classes=[IsAuthenticated], url_name='like')
     def like(self, request, slug):
-        post = get_object_or_404(Post, slug=slug)
+        minimal = prefers_minimal(request)
+        post = get_object_or_404(Post.objects.all() if minimal else Post.objects.with_related(), slug=slug)
         request_maker = request.user.profile
         if request.method == 'POST':
             request_maker.like(post)
         else:
             request_maker.dislike(post)
+        if minimal:
+            return minimal_response({'post': {
+                'slug': post.slug,
+                'likes': post.likes_count,
+                'dislikes': post.dislikes_count
+            }})
         serializer = self.serializer_class(
             post,
             context={'user': request.user}
@@ -126,10 +227,30 @@ class PostViewSet(ModelViewSet):
 
     @list_route(methods=['GET'], permission_classes=[IsAuthenticated], url_name='feed')
     def feed(self, request):
-        user = request.user
-        qset = Post.objects.filter(author__in=user.profile.followees.all())
-        qset = qset.order_by('-created_at', '-modified_at')
-        page = self.paginate_queryset(qset)
+        profile = request.user.profile
+        popular = list(profile.followees.filter(is_popular=True).values_list('pk', flat=True))
+        if popular:
+            # posts of popular authors are not pushed into the feed, so they
+            # are merged with pushed ones at read time, as many of each as the
+            # requested page may need
+            paginator = self.paginator
+            if isinstance(paginator, KeysetPagination):
+                position, reverse = paginator.decode_cursor(request, Post)
+                qset = Post.objects.merged_feed(
+                    profile, popular, paginator.get_page_size(request) + 1, position, reverse
+                )
+            else:
+                size = paginator.get_offset(request) + paginator.get_limit(request) + 1
+                qset = Post.objects.merged_feed(profile, popular, size)
+                pushed = FeedEntry.objects.filter(owner=profile).values('post_id')
+                paginator.count_queryset = Post.objects.filter(Q(pk__in=pushed) | Q(author__in=popular))
+            qset = qset.with_related().order_by('-created_at', '-id')
+            page = self.paginate_queryset(qset)
+        else:
+            qset = FeedEntry.objects.filter(owner=profile)
+            qset = qset.select_related('post__author__user').prefetch_related('post__tags')
+            qset = qset.order_by('-created_at', '-id')
+            page = [entry.post for entry in self.paginate_queryset(qset)]
         serializer = self.serializer_class(
             page,
             context={'user': request.user},
@@ -141,15 +262,49 @@ class PostViewSet(ModelViewSet):
 class CommentListCreateAPIView(ListCreateAPIView):
     permission_classes = (IsAuthenticatedOrReadOnly, )
     serializer_class = CommentSerializer
+    pagination_class = CommentsCursorPagination
 
     def list(self, request, slug, *args, **kwargs):
         post = get_object_or_404(Post, slug=slug)
-        qset = Comment.objects.filter(post=post)
+        page = self.paginate_queryset(Comment.objects.filter(post=post).select_related('author__user'))
+        followee_ids = None
+        if request.user.is_authenticated:
+            followee_ids = request.user.profile.get_followee_ids({comment.author_id for comment in page})
+        return conditional_response(
+            request,
+            self._get_etag(request, post, page, followee_ids),
+            lambda: self._list(request, post, page, followee_ids)
+        )
+
+    def _list(self, request, post, page, followee_ids):
         serializer = self.serializer_class(
-            qset,
-            context={'user': request.user},
+            page,
+            context={'user': request.user, 'followee_ids': followee_ids},
             many=True)
-        return Response({'comments': serializer.data}, status=status.HTTP_200_OK)
+        response = self.get_paginated_response(serializer.data)
+        response.data['commentsCount'] = post.comments_count
+        return response
+
+    def _get_etag(self, request, post, page, followee_ids):
+        """
+        A page changes with its comments, profiles of their authors and
+        follow state of the request maker for them, all of which are read
+        along with the page, and with the maintained comments counter, so the
+        cost of validation doesn't grow with the thread.
+        """
+        comments = [
+            (comment.pk, comment.modified_at, comment.author.modified_at, comment.author.user.username)
+            for comment in page
+        ]
+        return make_etag(
+            request.get_full_path(),
+            post.pk,
+            post.comments_count,
+            comments,
+            sorted(followee_ids or ()),
+            self.paginator.get_next_link(),
+            self.paginator.get_previous_link(),
+        )
 
     def create(self, request, slug, *args, **kwargs):
         post = get_object_or_404(Post, slug=slug)
@@ -169,8 +324,7 @@ class CommentDestroyAPIView(DestroyAPIView):
 
     def destroy(self, request, slug, pk, *args, **kwargs):
         comment = get_object_or_404(Comment, post__slug=slug, pk=pk)
-        request_maker = request.user.profile
-        if not request_maker.is_author_of(comment):
+        if comment.author_id != get_profile_id(request):
             raise PermissionDenied
         comment.delete()
         return Response(status=status.HTTP_200_OK)
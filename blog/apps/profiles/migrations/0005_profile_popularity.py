@@ -0,0 +1,36 @@
+# Generated by Django 2.2.28 on 2026-10-18 17:15
+
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models.functions import Coalesce
+
+
+def count_followers(apps, schema_editor):
+    Profile = apps.get_model('profiles', 'Profile')
+    followers = Profile.followees.through.objects.filter(to_profile=models.OuterRef('pk')).order_by()
+    followers = followers.values('to_profile').annotate(count=models.Count('*')).values('count')
+    Profile.objects.update(followers_count=Coalesce(models.Subquery(followers), 0))
+    Profile.objects.filter(
+        followers_count__gt=settings.FEED_FANOUT_FOLLOWERS_LIMIT
+    ).update(is_popular=True)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('profiles', '0004_auto_20180330_1704'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='profile',
+            name='followers_count',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='profile',
+            name='is_popular',
+            field=models.BooleanField(default=False),
+        ),
+        migrations.RunPython(count_followers, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 2.2.28 on 2026-10-18 17:21
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('profiles', '0005_profile_popularity'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='profile',
+            name='modified_at',
+            field=models.DateTimeField(auto_now=True),
+        ),
+    ]
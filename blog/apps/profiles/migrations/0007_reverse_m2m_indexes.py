@@ -0,0 +1,39 @@
+from django.db import migrations, models
+
+# Covering indexes for reverse lookups (who favorited a post, who follows a
+# profile). Auto-created tables can't carry Meta.indexes, so these are managed
+# by the schema editor directly. Removed by 0008: Django already indexes every
+# foreign key column of these tables, which serves the same lookups.
+REVERSE_INDEXES = [
+    ('favorites', ['post', 'profile'], 'profiles_fav_post_profile_idx'),
+    ('liked_posts', ['post', 'profile'], 'profiles_like_post_profile_idx'),
+    ('disliked_posts', ['post', 'profile'], 'profiles_disl_post_profile_idx'),
+    ('followees', ['to_profile', 'from_profile'], 'profiles_follow_to_from_idx'),
+]
+
+
+def reverse_indexes(apps):
+    Profile = apps.get_model('profiles', 'Profile')
+    for field, fields, name in REVERSE_INDEXES:
+        yield getattr(Profile, field).through, models.Index(fields=fields, name=name)
+
+
+def add_indexes(apps, schema_editor):
+    for through, index in reverse_indexes(apps):
+        schema_editor.add_index(through, index)
+
+
+def remove_indexes(apps, schema_editor):
+    for through, index in reverse_indexes(apps):
+        schema_editor.remove_index(through, index)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('profiles', '0006_profile_modified_at'),
+    ]
+
+    operations = [
+        migrations.RunPython(add_indexes, remove_indexes),
+    ]
@@ -0,0 +1,38 @@
+from django.db import migrations, models
+
+# The indexes of 0007 start with the column Django already indexes for the
+# foreign key, so they only added covering to the reverse lookups and cost
+# every favorite, like and follow an extra index write.
+REVERSE_INDEXES = [
+    ('favorites', ['post', 'profile'], 'profiles_fav_post_profile_idx'),
+    ('liked_posts', ['post', 'profile'], 'profiles_like_post_profile_idx'),
+    ('disliked_posts', ['post', 'profile'], 'profiles_disl_post_profile_idx'),
+    ('followees', ['to_profile', 'from_profile'], 'profiles_follow_to_from_idx'),
+]
+
+
+def reverse_indexes(apps):
+    Profile = apps.get_model('profiles', 'Profile')
+    for field, fields, name in REVERSE_INDEXES:
+        yield getattr(Profile, field).through, models.Index(fields=fields, name=name)
+
+
+def remove_indexes(apps, schema_editor):
+    for through, index in reverse_indexes(apps):
+        schema_editor.remove_index(through, index)
+
+
+def add_indexes(apps, schema_editor):
+    for through, index in reverse_indexes(apps):
+        schema_editor.add_index(through, index)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('profiles', '0007_reverse_m2m_indexes'),
+    ]
+
+    operations = [
+        migrations.RunPython(remove_indexes, add_indexes),
+    ]
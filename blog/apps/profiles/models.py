@@ -1,6 +1,35 @@
-from django.db import models
+from django.conf import settings
+from django.db import models, transaction
+from django.db.models.functions import Coalesce
 
 from apps.authentication.models import User
+from apps.core.db import insert_or_ignore
+from apps.posts.models import FeedEntry
+
+
+class ProfileQuerySet(models.QuerySet):
+
+    def with_actual_counters(self):
+        """
+        Annotate every profile with `actual_followers_count`, calculated from
+        the follows table. Meant for reconciliation of the counter.
+        """
+        return self.annotate(actual_followers_count=self._actual_followers_count())
+
+    def reconcile_counters(self):
+        """
+        Overwrites followers counter with the value calculated from the follows
+        table, and flags profiles which have got too many followers as popular.
+        The flag is never cleared, posts of popular profiles weren't fanned out.
+        """
+        updated = self.update(followers_count=self._actual_followers_count())
+        self.filter(followers_count__gt=settings.FEED_FANOUT_FOLLOWERS_LIMIT).update(is_popular=True)
+        return updated
+
+    def _actual_followers_count(self):
+        followers = Profile.followees.through.objects.filter(to_profile=models.OuterRef('pk')).order_by()
+        followers = followers.values('to_profile').annotate(count=models.Count('*')).values('count')
+        return Coalesce(models.Subquery(followers), 0)
 
 
 class Profile(models.Model):
@@ -11,41 +40,92 @@ class Profile(models.Model):
     favorites = models.ManyToManyField('posts.Post', related_name='favorited_by')
     liked_posts = models.ManyToManyField('posts.Post', related_name='liked_by')
     disliked_posts = models.ManyToManyField('posts.Post', related_name='disliked_by')
+    followers_count = models.IntegerField(default=0)
+    # posts of popular profiles are not fanned out on write, followers pull
+    # them at read time, see FEED_FANOUT_FOLLOWERS_LIMIT setting
+    is_popular = models.BooleanField(default=False)
+    modified_at = models.DateTimeField(auto_now=True)
+
+    objects = ProfileQuerySet.as_manager()
 
     def __str__(self):
         return self.user.username
 
     def favorite(self, post):
-        self.favorites.add(post)
+        with transaction.atomic():
+            added = insert_or_ignore(self.favorites.through, profile_id=self.pk, post_id=post.pk)
+            post.change_counters(favorites_count=added)
 
     def follow(self, profile):
         if profile != self:
-            self.followees.add(profile)
+            with transaction.atomic():
+                added = self.followees.through.objects.get_or_create(from_profile=self, to_profile=profile)[1]
+                if added:
+                    Profile.objects.filter(pk=profile.pk).update(
+                        followers_count=models.F('followers_count') + 1,
+                        is_popular=models.Case(
+                            models.When(followers_count__gte=settings.FEED_FANOUT_FOLLOWERS_LIMIT, then=True),
+                            default=models.F('is_popular'),
+                        )
+                    )
+                    profile.refresh_from_db(fields=['followers_count', 'is_popular'])
+                    if not profile.is_popular:
+                        FeedEntry.objects.backfill(self, profile)
 
     def unfavorite(self, post):
-        self.favorites.remove(post)
+        with transaction.atomic():
+            removed = self.favorites.through.objects.filter(profile=self, post=post).delete()[0]
+            post.change_counters(favorites_count=-removed)
 
     def unfollow(self, profile):
         if profile != self:
-            self.followees.remove(profile)
+            with transaction.atomic():
+                removed = self.followees.through.objects.filter(from_profile=self, to_profile=profile).delete()[0]
+                if removed:
+                    Profile.objects.filter(pk=profile.pk).update(followers_count=models.F('followers_count') - 1)
+                    profile.followers_count -= 1
+                    FeedEntry.objects.prune(self, profile)
 
     def has_in_favorites(self, post):
         return self.favorites.filter(pk=post.pk).exists()
 
+    def get_favorited_ids(self, post_pks):
+        """
+        Returns a set of given post pks which are in favorites.
+        """
+        favorites = self.favorites.through.objects.filter(
+            profile=self, post__in=post_pks
+        )
+        return set(favorites.values_list('post_id', flat=True))
+
+    def get_followee_ids(self, profile_pks):
+        """
+        Returns a set of given profile pks which are followed by this profile.
+        """
+        followees = self.followees.through.objects.filter(
+            from_profile=self, to_profile__in=profile_pks
+        )
+        return set(followees.values_list('to_profile_id', flat=True))
+
     def has_in_followees(self, profile):
         return self.followees.filter(pk=profile.pk).exists()
 
+    # like and dislike write the liked posts table before the disliked one,
+    # so that concurrent reactions lock the rows in the same order
+
     def like(self, post):
         if not self.is_author_of(post):
-            if self.has_disliked_post(post):
-                self.disliked_posts.remove(post)
-            self.liked_posts.add(post)
+            with transaction.atomic():
+                added = insert_or_ignore(self.liked_posts.through, profile_id=self.pk, post_id=post.pk)
+                removed = self.disliked_posts.through.objects.filter(profile=self, post=post).delete()[0]
+                post.change_counters(likes_count=added, dislikes_count=-removed)
 
     def dislike(self, post):
         if not self.is_author_of(post):
-            if self.has_liked_post(post):
-                self.liked_posts.remove(post)
-            self.disliked_posts.add(post)
+            with transaction.atomic():
+                removed = self.liked_posts.through.objects.filter(profile=self, post=post).delete()[0]
+                added = insert_or_ignore(self.disliked_posts.through, profile_id=self.pk, post_id=post.pk)
+                post.change_counters(likes_count=-removed, dislikes_count=added)
 
     def has_liked_post(self, post):
         return self.liked_posts.filter(pk=post.pk).exists()
@@ -54,4 +134,4 @@ class Profile(models.Model):
         return self.disliked_posts.filter(pk=post.pk).exists()
 
     def is_author_of(self, post_or_comment):
-        return post_or_comment.author == self
+        return post_or_comment.author_id == self.pk
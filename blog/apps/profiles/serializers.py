@@ -19,9 +19,16 @@ class ProfileSerializer(serializers.ModelSerializer):
     def get_following(self, obj):
         """
         Check if request maker follows profile viewed.
+
+        List serializers which embed profiles put followee pks of the request
+        maker into the context, so all nested profile serializers of one
+        response share them instead of querying db for each profile.
         """
         user = self.context.get('user', None)
         if user and user.is_authenticated:
+            followee_ids = self.context.get('followee_ids', None)
+            if followee_ids is not None:
+                return obj.pk in followee_ids
             return user.profile.has_in_followees(obj)
         return False
 
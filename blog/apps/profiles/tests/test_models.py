@@ -1,4 +1,7 @@
-from django.test import TestCase
+from io import StringIO
+
+from django.core.management import call_command
+from django.test import TestCase, override_settings
 
 from apps.posts.models import Post
 
@@ -153,3 +156,62 @@ class ProfileModelTests(TestCase):
         dislikes_after = post.disliked_by.count()
         self.assertEqual(likes_after - likes_before, 1)
         self.assertEqual(dislikes_after - dislikes_before, 0)
+
+    def test_reaction_counters(self):
+        kyle = Profile.objects.get(user__username='kyle')
+        post = Post.objects.first()
+        kyle.like(post)
+        kyle.like(post)
+        kyle.dislike(post)
+        kyle.favorite(post)
+        kyle.favorite(post)
+        post.refresh_from_db()
+        self.assertEqual(post.likes_count, post.liked_by.count())
+        self.assertEqual(post.dislikes_count, post.disliked_by.count())
+        self.assertEqual(post.favorites_count, post.favorited_by.count())
+        kyle.unfavorite(post)
+        kyle.unfavorite(post)
+        post.refresh_from_db()
+        self.assertEqual(post.favorites_count, post.favorited_by.count())
+
+    def test_reactions_without_reads(self):
+        kyle = Profile.objects.get(user__username='kyle')
+        post = Post.objects.first()
+        kyle.unfavorite(post)
+        # savepoint, insert, counter update, release
+        with self.assertNumQueries(4):
+            kyle.favorite(post)
+        with self.assertNumQueries(3):
+            kyle.favorite(post)
+        kyle.dislike(post)
+        # savepoint, insert, delete, counters update, release
+        with self.assertNumQueries(5):
+            kyle.like(post)
+
+    def test_followers_count(self):
+        kenny = Profile.objects.get(user__username='kenny')
+        kyle = Profile.objects.get(user__username='kyle')
+        kyle.follow(kenny)
+        kyle.follow(kenny)
+        kenny.refresh_from_db()
+        self.assertEqual(kenny.followers_count, kenny.followers.count())
+        kyle.unfollow(kenny)
+        kyle.unfollow(kenny)
+        kenny.refresh_from_db()
+        self.assertEqual(kenny.followers_count, kenny.followers.count())
+
+    def test_reconcile_followers_command(self):
+        kenny = Profile.objects.get(user__username='kenny')
+        kyle = Profile.objects.get(user__username='kyle')
+        stan = Profile.objects.get(user__username='stan')
+        kyle.follow(kenny)
+        stan.follow(kenny)
+        kyle.user.delete()
+        kenny.refresh_from_db()
+        self.assertNotEqual(kenny.followers_count, kenny.followers.count())
+        with override_settings(FEED_FANOUT_FOLLOWERS_LIMIT=0):
+            call_command('reconcile_post_counters', stdout=StringIO())
+        kenny.refresh_from_db()
+        self.assertEqual(kenny.followers_count, kenny.followers.count())
+        self.assertEqual(kenny.followers_count, 1)
+        self.assertTrue(kenny.is_popular)
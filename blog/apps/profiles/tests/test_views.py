@@ -52,6 +52,18 @@ class ProfileViewTests(ProfilesTests):
         self.assertEqual(profile['username'], 'stan')
         self.assertTrue(profile['following'])
 
+    def test_get_profile_info_not_modified(self):
+        token = User.objects.get(username='kenny').token
+        path = self.get_request_path(reverse_kwargs={'username': 'stan'})
+        response = self.client.get(path, **self.get_headers(token=token))
+        etag = response['ETag']
+        response = self.client.get(path, HTTP_IF_NONE_MATCH=etag, **self.get_headers(token=token))
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+        User.objects.get(username='kenny').profile.unfollow(User.objects.get(username='stan').profile)
+        response = self.client.get(path, HTTP_IF_NONE_MATCH=etag, **self.get_headers(token=token))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertFalse(response.data['profile']['following'])
+
     def test_get_profile_info_unauthenticated(self):
         response = self.client.get(
             self.get_request_path(reverse_kwargs={'username': 'stan'}),
@@ -103,6 +115,17 @@ class ProfileFollowViewTests(ProfilesTests):
         data = response.data.get('profile', None)
         self.assertFalse(data['following'])
 
+    def test_follow_minimal(self):
+        follower = User.objects.get(username='kenny')
+        response = self.client.post(
+            self.get_request_path(reverse_kwargs={'username': 'kyle'}),
+            HTTP_PREFER='return=minimal',
+            **self.get_headers(token=follower.token)
+        )
+        self.assertEqual(response.status_code, status.HTTP_204_NO_CONTENT)
+        self.assertEqual(response['Preference-Applied'], 'return=minimal')
+        self.assertTrue(follower.profile.followees.filter(user__username='kyle').exists())
+
     def test_unauthenticated(self):
         response = self.client.post(
             self.get_request_path(reverse_kwargs={'username': 'kyle'}),
@@ -1,6 +1,8 @@
 from rest_framework import permissions, status, views
 from rest_framework.response import Response
 
+from apps.core.conditional import conditional_response, make_etag
+from apps.core.prefer import minimal_response, prefers_minimal
 from apps.core.shortcuts import get_object_or_404
 
 from .models import Profile
@@ -15,8 +17,16 @@ class ProfileAPIView(views.APIView):
     serializer_class = ProfileSerializer
 
     def get(self, request, username, *args, **kwargs):
-        profile = get_object_or_404(Profile, user__username=username)
-        serializer = self.serializer_class(profile, context={'user': request.user})
+        profile = get_object_or_404(Profile.objects.select_related('user'), user__username=username)
+        following = request.user.is_authenticated and request.user.profile.has_in_followees(profile)
+        etag = make_etag(profile.user.username, profile.about, profile.pic, following)
+        return conditional_response(request, etag, lambda: self._get(request, profile, following))
+
+    def _get(self, request, profile, following):
+        serializer = self.serializer_class(
+            profile,
+            context={'user': request.user, 'followee_ids': {profile.pk} if following else set()}
+        )
         return Response({'profile': serializer.data}, status=status.HTTP_200_OK)
 
 
@@ -25,7 +35,7 @@ class ProfileFollowAPIView(views.APIView):
     Handles profile fllows/unfollows.
 
     Adds/removes profile to the list of followees of a currently authenticated
-    user.
+    user. Responds with empty 204 if client prefers minimal responses.
     """
     permission_classes = (permissions.IsAuthenticated,)
     serializer_class = ProfileSerializer
@@ -34,6 +44,8 @@ class ProfileFollowAPIView(views.APIView):
         follower = request.user.profile
         followee = get_object_or_404(Profile, user__username=username)
         follower.follow(followee)
+        if prefers_minimal(request):
+            return minimal_response()
         serializer = self.serializer_class(followee, context={'user': request.user})
         return Response({'profile': serializer.data}, status=status.HTTP_200_OK)
 
@@ -41,6 +53,8 @@ class ProfileFollowAPIView(views.APIView):
         follower = request.user.profile
         followee = get_object_or_404(Profile, user__username=username)
         follower.unfollow(followee)
+        if prefers_minimal(request):
+            return minimal_response()
         serializer = self.serializer_class(followee, context={'user': request.user})
         return Response({'profile': serializer.data}, status=status.HTTP_200_OK)
 
@@ -111,6 +111,25 @@ DATABASES = {
 }
 
 
+# Cache
+# https://docs.djangoproject.com/en/2.0/topics/cache/
+
+# Authenticated users are cached and dropped from the cache whenever they or
+# their profiles are saved, so every process serving the API has to share the
+# cache. The default local memory cache is private to a process and only fits
+# runserver and tests, deployments with several workers set a shared memory
+# backend, e.g. CACHE_BACKEND=django.core.cache.backends.memcached.MemcachedCache
+# with CACHE_LOCATION=host:port. The database cache is only a fallback for
+# setups without memcached: every hit costs a query and every write three,
+# which gives back most of what the principal and post caches save.
+CACHES = {
+    'default': {
+        'BACKEND': os.environ.get('CACHE_BACKEND', 'django.core.cache.backends.locmem.LocMemCache'),
+        'LOCATION': os.environ.get('CACHE_LOCATION', ''),
+    }
+}
+
+
 # Password validation
 # https://docs.djangoproject.com/en/2.0/ref/settings/#auth-password-validators
 
@@ -142,6 +161,40 @@ REST_FRAMEWORK = {
     'NON_FIELD_ERRORS_KEY': 'error'
 }
 
+# Authentication
+
+# Seconds for which an authenticated user is cached along with the profile,
+# the entry is dropped on every save of either of them, see CACHES
+AUTH_PRINCIPAL_CACHE_TIMEOUT = 60
+
+# Max number of verified tokens whose claims are kept in memory by every
+# process until the tokens expire, 0 disables the cache
+AUTH_TOKEN_CACHE_SIZE = 10000
+
+# Posts pagination
+
+# Seconds for which the total number of posts is cached for each filter set
+POSTS_COUNT_CACHE_TIMEOUT = 30
+
+# Unfiltered posts table with more rows than this is counted approximately
+POSTS_COUNT_ESTIMATE_THRESHOLD = 100000
+
+# Rendered posts cache
+
+# Seconds for which rendered posts are cached, the cache is keyed by the post
+# modification time, so the timeout only limits memory usage
+POST_CACHE_TIMEOUT = 300
+
+# Home feed
+
+# Number of the most recent posts of a followed author put into the feed
+FEED_BACKFILL_LIMIT = 1000
+
+# Posts of authors with more followers than this are pulled into the feeds at
+# read time instead of being copied into the feed of every follower on write,
+# see `benchmark_feed` command for picking the value
+FEED_FANOUT_FOLLOWERS_LIMIT = 10000
+
 # Internationalization
 # https://docs.djangoproject.com/en/2.0/topics/i18n/
 